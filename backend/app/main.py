@@ -1,10 +1,44 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from app.routes import user, prediction, all_meals, weekly_summary, save_meal, delete_meal
+from fastapi.responses import JSONResponse
+from app.routes import user, prediction, all_meals, weekly_summary, save_meal, delete_meal, images
+from app.utils import indexes, outbox, passwords
+from app.utils.http_cache import CachedStaticFiles
+from app.utils.uploads import UploadSizeLimitMiddleware
+from app.utils.db import get_db, open_clients, close_clients
+from contextlib import asynccontextmanager
+import asyncio
 import os
 
-app = FastAPI()
+
+def _bootstrap_indexes():
+    try:
+        report = indexes.ensure_indexes(get_db())
+        print("[startup] Indexes: " + ", ".join(f"{c}.{n} {s}" for c, n, s in report))
+    except Exception as e:
+        print(f"[startup] Index bootstrap skipped: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # one pooled Motor client for the lifetime of the process
+    open_clients()
+    # runs in the background so an unreachable database does not block startup
+    if indexes.ENSURE_INDEXES_ON_STARTUP:
+        asyncio.get_running_loop().run_in_executor(None, _bootstrap_indexes)
+    # delivers queued reset/OTP emails over one reused SMTP session
+    if outbox.EMAIL_OUTBOX_SENDER:
+        outbox.sender.start()
+    await prediction.startup()
+    yield
+    # stop everything that may still use the database before closing its clients
+    await outbox.sender.stop()
+    await prediction.shutdown()
+    close_clients()
+    passwords.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Enable CORS for frontend-backend communication (allow common dev origins)
 def parse_origins(env_var: str):
@@ -32,10 +66,15 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Turn away oversized uploads before Starlette spools the multipart body
+app.add_middleware(UploadSizeLimitMiddleware)
 
-# Mount static folder so uploaded images can be served at /static/
+# Mount the legacy image folders so previously uploaded images are served at
+# /static/meal_images and /static/profile_images (new uploads: /api/images)
 static_path = os.path.join(os.path.dirname(__file__), "models")
-app.mount("/static", StaticFiles(directory=static_path), name="static")
+for folder in ("meal_images", "profile_images"):
+    os.makedirs(os.path.join(static_path, folder), exist_ok=True)
+    app.mount(f"/static/{folder}", CachedStaticFiles(directory=os.path.join(static_path, folder)), name=folder)
 print(f"[startup] Static files mounted at: {os.path.abspath(static_path)}")
 
 # Include routers
@@ -45,8 +84,23 @@ app.include_router(all_meals.router, prefix="/api/user", tags=["meal"])
 app.include_router(weekly_summary.router, prefix="/api/user", tags=["summary"])
 app.include_router(save_meal.router, prefix="/api/user", tags=["meal"])
 app.include_router(delete_meal.router, prefix="/api/user", tags=["meal"])
+app.include_router(images.router, prefix="/api/images", tags=["images"])
 
 
 @app.get("/")
 def read_root():
-    return {"NutriPK": "Backend is running"}
\ No newline at end of file
+    return {"NutriPK": "Backend is running"}
+
+
+@app.get("/healthz")
+def healthz():
+    """Liveness: the process is up and serving requests."""
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+def readyz():
+    """Readiness: 200 once the prediction model is loaded and warmed up, 503 before
+    that or if loading failed. Reports load state, backend and warm-up latency."""
+    status = dict(prediction.model_status)
+    return JSONResponse(status, status_code=200 if prediction.is_ready() else 503)
\ No newline at end of file
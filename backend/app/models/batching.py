@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """Collect concurrent requests and run them through the model as one batch.
+
+    Callers ``await submit(item)`` and get back their own result. A background
+    task drains the queue and flushes a batch as soon as ``max_batch_size`` items
+    are waiting or ``max_wait_ms`` has passed since the first item of the batch
+    arrived, whichever comes first.
+
+    ``process_batch`` is an async callable that receives a list of items and
+    must return a list of results in the same order. An exception instance in
+    place of a result fails only that item's caller; raising fails the batch. Up to
+    ``max_concurrent_batches`` batches may be in flight at once, so a pool with
+    several inference workers stays busy.
+    """
+
+    def __init__(self, process_batch, max_batch_size=8, max_wait_ms=5.0, max_concurrent_batches=1):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.max_concurrent_batches = max(1, max_concurrent_batches)
+        self._queue = None
+        self._worker = None
+        self._slots = None
+        self._in_flight = set()
+        # metrics
+        self._batch_sizes = Counter()
+        self._queue_depths = Counter()
+        self._max_queue_depth = 0
+        self._items_processed = 0
+        self._batches_failed = 0
+
+    def start(self):
+        """Start the background flush task on the running event loop."""
+        if self._worker is not None:
+            return
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush task and fail any requests still waiting."""
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        # cancelled batches fail their own callers before finishing
+        in_flight = list(self._in_flight)
+        for task in in_flight:
+            task.cancel()
+        await asyncio.gather(*in_flight, return_exceptions=True)
+        while not self._queue.empty():
+            _, fut = self._queue.get_nowait()
+            if not fut.done():
+                fut.set_exception(RuntimeError("Batcher stopped"))
+
+    @staticmethod
+    def _fail_stopped(batch):
+        for _, fut in batch:
+            if not fut.done():
+                fut.set_exception(RuntimeError("Batcher stopped"))
+
+    async def submit(self, item):
+        """Queue an item and wait for its result."""
+        if self._worker is None:
+            self.start()
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, fut))
+        depth = self._queue.qsize()
+        self._queue_depths[depth] += 1
+        self._max_queue_depth = max(self._max_queue_depth, depth)
+        return await fut
+
+    async def _collect(self):
+        """Wait for the first item, then gather more until full or timed out."""
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        try:
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    # grab whatever is already queued without waiting
+                    if self._queue.empty():
+                        break
+                    batch.append(self._queue.get_nowait())
+                    continue
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+        except asyncio.CancelledError:
+            # stopped mid-collection: these items are no longer in the queue
+            self._fail_stopped(batch)
+            raise
+        return batch
+
+    async def _run(self):
+        while True:
+            # Only start collecting once a worker slot is free, so items keep
+            # accumulating into a bigger batch while all workers are busy.
+            await self._slots.acquire()
+            try:
+                batch = await self._collect()
+            except BaseException:
+                self._slots.release()
+                raise
+            task = asyncio.get_running_loop().create_task(self._flush(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _flush(self, batch):
+        try:
+            # Skip callers that gave up (e.g. client disconnected)
+            batch = [(item, fut) for item, fut in batch if not fut.done()]
+            if not batch:
+                return
+            self._batch_sizes[len(batch)] += 1
+            items = [item for item, _ in batch]
+            try:
+                results = await self.process_batch(items)
+                if len(results) != len(items):
+                    raise RuntimeError(
+                        f"Batch returned {len(results)} results for {len(items)} items"
+                    )
+            except asyncio.CancelledError:
+                self._fail_stopped(batch)
+                raise
+            except Exception as exc:
+                self._batches_failed += 1
+                logger.error(f"Batch of {len(items)} failed: {exc}")
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(exc)
+                return
+            self._items_processed += len(items)
+            for (_, fut), result in zip(batch, results):
+                if fut.done():
+                    continue
+                if isinstance(result, BaseException):
+                    fut.set_exception(result)
+                else:
+                    fut.set_result(result)
+        finally:
+            self._slots.release()
+
+    def stats(self):
+        """Return queue depth and batch size histograms for tuning."""
+        batches = sum(self._batch_sizes.values())
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "max_concurrent_batches": self.max_concurrent_batches,
+            "batches_in_flight": len(self._in_flight),
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue_depth": self._max_queue_depth,
+            "batches": batches,
+            "batches_failed": self._batches_failed,
+            "items_processed": self._items_processed,
+            "mean_batch_size": (
+                sum(k * v for k, v in self._batch_sizes.items()) / batches if batches else 0.0
+            ),
+            "batch_size_histogram": {str(k): v for k, v in sorted(self._batch_sizes.items())},
+            "queue_depth_histogram": {str(k): v for k, v in sorted(self._queue_depths.items())},
+        }
@@ -0,0 +1,67 @@
+"""Per-backend inference latency table for the dish classifier.
+
+Times backend.predict on random 224x224x3 batches for every model file that
+exists (model.keras, model.tflite, model_float16.tflite, model_int8.tflite,
+model.onnx, model_int8.onnx).
+
+Usage:
+  python -m app.models.bench_backends --batch-sizes 1,8 --runs 30 --threads 4
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from app.models.prediction import BACKENDS, IMG_SIZE, MODEL_DIR
+
+CANDIDATES = [
+    ("keras", "model.keras"),
+    ("tflite", "model.tflite"),
+    ("tflite", "model_float16.tflite"),
+    ("tflite", "model_int8.tflite"),
+    ("onnx", "model.onnx"),
+    ("onnx", "model_int8.onnx"),
+]
+
+
+def bench(backend, batch_size, runs):
+    batch = np.random.default_rng(0).random((batch_size, *IMG_SIZE, 3), dtype=np.float32)
+    backend.predict(batch)  # first call allocates / traces
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        backend.predict(batch)
+        samples.append((time.perf_counter() - start) * 1000.0)
+    samples.sort()
+    return statistics.mean(samples), samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare inference latency across backends')
+    parser.add_argument('--batch-sizes', type=str, default='1,8')
+    parser.add_argument('--runs', type=int, default=30)
+    parser.add_argument('--threads', type=int, default=0, help='Intra-op threads (0 = runtime default)')
+    args = parser.parse_args()
+    batch_sizes = [int(b) for b in args.batch_sizes.split(',')]
+
+    print(f"{'backend':<8} {'file':<24} {'MB':>7} {'load s':>7} {'batch':>6} {'mean ms':>9} {'p95 ms':>9} {'ms/img':>8}")
+    for name, filename in CANDIDATES:
+        path = MODEL_DIR / filename
+        if not path.exists():
+            continue
+        start = time.perf_counter()
+        try:
+            backend = BACKENDS[name](path, args.threads)
+        except ImportError as e:
+            print(f"{name:<8} {filename:<24} skipped: {e}")
+            continue
+        load_s = time.perf_counter() - start
+        size_mb = path.stat().st_size / 1e6
+        for bs in batch_sizes:
+            mean, p95 = bench(backend, bs, args.runs)
+            print(f"{name:<8} {filename:<24} {size_mb:>7.2f} {load_s:>7.2f} {bs:>6} {mean:>9.2f} {p95:>9.2f} {mean / bs:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Benchmark nutrient lookups as the nutrient table grows.
+
+Compares the previous per-call implementation (regexes compiled on every
+call, difflib.get_close_matches over every key) with NutrientIndex, both on
+first lookup of a name (cold) and on repeated lookups (memoized).
+
+Usage:
+  python -m app.models.bench_nutrients --sizes 100,1000,5000 --queries 300
+"""
+import argparse
+import difflib
+import random
+import re
+import time
+
+from app.models.nutrients import NutrientIndex, normalize_name
+
+SYLLABLES = ["aa", "lo", "go", "sht", "ma", "tar", "bi", "rya", "ni", "cha", "na", "pa", "ya",
+             "ko", "fta", "ka", "bab", "ha", "leem", "sa", "mo", "qor", "da", "al", "chaw"]
+
+
+def legacy_lookup(table, dish_name):
+    """The lookup as it was before NutrientIndex, kept here for comparison."""
+    s = str(dish_name)
+    key = re.sub(r"[^a-z0-9]+", "_", s.strip().lower())
+    key = re.sub(r"_+", "_", key).strip('_')
+    key_base = re.sub(r"\(.*?\)", " ", s.strip().lower())
+    key_base = re.sub(r"[^a-z0-9]+", "_", key_base)
+    key_base = re.sub(r"_+", "_", key_base).strip('_')
+    if key in table:
+        return table.get(key)
+    if key_base in table:
+        return table.get(key_base)
+    alt = key.replace('ghost', 'gosht')
+    if alt in table:
+        return table.get(alt)
+    alt2 = key.replace('gosht', 'ghost')
+    if alt2 in table:
+        return table.get(alt2)
+    key_clean = re.sub(r"[^a-z0-9_]", "", key)
+    if key_clean in table:
+        return table.get(key_clean)
+    candidates = difflib.get_close_matches(key, list(table.keys()), n=1, cutoff=0.6)
+    if candidates:
+        return table.get(candidates[0])
+    return None
+
+
+def synthetic_table(size, rng):
+    table = {}
+    while len(table) < size:
+        words = ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+                 for _ in range(rng.randint(1, 3))]
+        table[normalize_name(" ".join(words))] = {"Calories(kcal)": rng.randint(20, 500)}
+    return table
+
+
+def misspell(name, rng):
+    chars = list(name)
+    i = rng.randrange(len(chars))
+    chars[i] = rng.choice("aeioukst")
+    return "".join(chars).replace("_", " ").title()
+
+
+def time_per_call(fn, queries):
+    start = time.perf_counter()
+    for q in queries:
+        fn(q)
+    return (time.perf_counter() - start) / len(queries) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark nutrient lookups against table size')
+    parser.add_argument('--sizes', type=str, default='100,1000,5000')
+    parser.add_argument('--queries', type=int, default=300)
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    print(f"{'entries':>8} {'legacy us':>10} {'index cold us':>14} {'index memo us':>14} {'build ms':>9}")
+    for size in (int(s) for s in args.sizes.split(',')):
+        table = synthetic_table(size, rng)
+        keys = list(table)
+        # mix of exact names, misspellings (fuzzy path) and unknown dishes
+        queries = []
+        for i in range(args.queries):
+            k = rng.choice(keys)
+            queries.append([k.replace("_", " ").title(), misspell(k, rng), f"unknown dish {i}"][i % 3])
+
+        legacy_us = time_per_call(lambda q: legacy_lookup(table, q), queries)
+        start = time.perf_counter()
+        index = NutrientIndex(table)
+        build_ms = (time.perf_counter() - start) * 1000.0
+        cold_us = time_per_call(index.lookup, queries)
+        memo_us = time_per_call(index.lookup, queries)
+        print(f"{size:>8} {legacy_us:>10.1f} {cold_us:>14.1f} {memo_us:>14.2f} {build_ms:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
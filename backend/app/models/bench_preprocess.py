@@ -0,0 +1,105 @@
+"""Benchmark per-request image preprocessing: temp-file path vs in-memory path.
+
+The old request path copied the upload into a NamedTemporaryFile, read it back
+with keras' load_img and then unlinked it. The new path decodes the uploaded
+bytes in memory with JPEG draft-mode downscaling.
+
+Usage:
+  python -m app.models.bench_preprocess --runs 50
+  python -m app.models.bench_preprocess --synthetic 4032x3024 --with-model
+"""
+import argparse
+import io
+import os
+import shutil
+import statistics
+import time
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+
+import numpy as np
+from PIL import Image
+
+from app.models.prediction import DishPredictor, IMG_SIZE, preprocess_image
+
+MEAL_IMAGES = Path(__file__).parent / "meal_images"
+
+
+def file_based_preprocess(data):
+    """The previous route + DishPredictor behaviour, kept here for comparison."""
+    from tensorflow.keras.preprocessing import image
+    with NamedTemporaryFile(delete=False) as temp_file:
+        shutil.copyfileobj(io.BytesIO(data), temp_file)
+        temp_path = temp_file.name
+    try:
+        img = image.load_img(temp_path, target_size=IMG_SIZE)
+        img_array = image.img_to_array(img)
+        img_array = np.expand_dims(img_array, axis=0)
+        return img_array / 255.0
+    finally:
+        os.unlink(temp_path)
+
+
+def synthetic_jpeg(size):
+    """A noisy JPEG of the given (w, h), similar in cost to a phone photo."""
+    w, h = size
+    rng = np.random.default_rng(0)
+    arr = rng.integers(0, 256, size=(h // 8, w // 8, 3), dtype=np.uint8)
+    img = Image.fromarray(arr).resize((w, h), Image.Resampling.BILINEAR)
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+def timeit(fn, data, runs):
+    fn(data)  # warm caches / lazy imports
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn(data)
+        samples.append((time.perf_counter() - start) * 1000.0)
+    samples.sort()
+    return {
+        "mean": statistics.mean(samples),
+        "p50": samples[len(samples) // 2],
+        "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare file-based and in-memory preprocessing latency')
+    parser.add_argument('--image', type=str, default=None, help='Image to use (default: first file in meal_images)')
+    parser.add_argument('--synthetic', type=str, default=None,
+                        help='Generate a synthetic JPEG of WxH instead, e.g. 4032x3024 (12MP)')
+    parser.add_argument('--runs', type=int, default=30)
+    parser.add_argument('--with-model', action='store_true', help='Also time preprocess + model.predict end to end')
+    args = parser.parse_args()
+
+    if args.synthetic:
+        w, h = (int(x) for x in args.synthetic.lower().split('x'))
+        data = synthetic_jpeg((w, h))
+        label = f"synthetic {w}x{h} JPEG"
+    else:
+        path = Path(args.image) if args.image else sorted(MEAL_IMAGES.iterdir())[0]
+        data = path.read_bytes()
+        label = str(path)
+    print(f"Image: {label} ({len(data) / 1024:.0f} KiB), runs={args.runs}")
+
+    rows = [
+        ("file (tempfile + load_img)", timeit(file_based_preprocess, data, args.runs)),
+        ("memory (bytes + draft)", timeit(preprocess_image, data, args.runs)),
+    ]
+
+    if args.with_model:
+        predictor = DishPredictor()
+        rows.append(("file + predict", timeit(
+            lambda d: predictor.backend.predict(file_based_preprocess(d)), data, args.runs)))
+        rows.append(("memory + predict", timeit(predictor.predict, data, args.runs)))
+
+    print(f"\n{'path':<30} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    for name, r in rows:
+        print(f"{name:<30} {r['mean']:>9.2f} {r['p50']:>9.2f} {r['p95']:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
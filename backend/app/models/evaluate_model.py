@@ -7,12 +7,27 @@ import json
 import math
 
 DATASET_PATH = Path(__file__).parent.parent.parent.parent / "dataset"
+MODEL_FILES = {'keras': 'model.keras', 'tflite': 'model.tflite', 'onnx': 'model.onnx'}
+
+
+def predict_with_backend(backend, generator, steps):
+    """Run an exported (TFLite/ONNX) backend over the generator batch by batch."""
+    generator.reset()
+    preds = []
+    for _ in range(steps):
+        x, _ = next(generator)
+        preds.append(backend.predict(x.astype(np.float32)))
+    return np.concatenate(preds, axis=0)[:generator.samples]
 
 
 def main():
     parser = argparse.ArgumentParser(description='Evaluate a saved Keras model on validation set')
-    parser.add_argument('--model', type=str, default=str(Path(__file__).parent / 'model.keras'),
-                        help='Path to the saved model (default: models/model.keras)')
+    parser.add_argument('--model', type=str, default=None,
+                        help='Path to the saved model (default: models/model.keras, .tflite or .onnx per backend)')
+    parser.add_argument('--backend', type=str, default='keras', choices=['keras', 'tflite', 'onnx'],
+                        help='Runtime used to evaluate the model (exported with export_model.py)')
+    parser.add_argument('--compare', action='store_true',
+                        help='With a non-keras backend, also evaluate models/model.keras and print the accuracy delta')
     parser.add_argument('--img-size', type=int, default=224)
     parser.add_argument('--batch-size', type=int, default=32)
     parser.add_argument('--subset', type=str, default='validation', choices=['training', 'validation'],
@@ -20,14 +35,11 @@ def main():
 
     args = parser.parse_args()
 
-    model_path = Path(args.model)
+    model_path = Path(args.model) if args.model else Path(__file__).parent / MODEL_FILES[args.backend]
     if not model_path.exists():
         print(f"Model file not found: {model_path}")
         return
 
-    print(f"Loading model from: {model_path}")
-    model = load_model(str(model_path))
-
     datagen = ImageDataGenerator(rescale=1./255, validation_split=0.2)
     generator = datagen.flow_from_directory(
         DATASET_PATH,
@@ -41,14 +53,39 @@ def main():
     steps = math.ceil(generator.samples / args.batch_size)
     print(f"Evaluating on {generator.samples} images (steps={steps})")
 
-    loss, acc = model.evaluate(generator, steps=steps, verbose=1)
-    print(f"Evaluation results - loss: {loss:.4f}  accuracy: {acc:.4f}")
-
-    # Predict and compute confusion matrix/report if sklearn available
-    print('Computing predictions for detailed report...')
-    preds = model.predict(generator, steps=steps, verbose=1)
-    y_pred = np.argmax(preds, axis=1)
     y_true = generator.classes
+    if args.backend == 'keras':
+        print(f"Loading model from: {model_path}")
+        model = load_model(str(model_path))
+        loss, acc = model.evaluate(generator, steps=steps, verbose=1)
+        print(f"Evaluation results - loss: {loss:.4f}  accuracy: {acc:.4f}")
+
+        # Predict and compute confusion matrix/report if sklearn available
+        print('Computing predictions for detailed report...')
+        preds = model.predict(generator, steps=steps, verbose=1)
+        y_pred = np.argmax(preds, axis=1)
+    else:
+        from app.models.prediction import BACKENDS
+        print(f"Loading {args.backend} model from: {model_path}")
+        backend = BACKENDS[args.backend](model_path)
+        preds = predict_with_backend(backend, generator, steps)
+        y_pred = np.argmax(preds, axis=1)
+        acc = float(np.mean(y_pred == y_true))
+        print(f"Evaluation results ({args.backend}) - accuracy: {acc:.4f}")
+
+        if args.compare:
+            keras_path = Path(__file__).parent / MODEL_FILES['keras']
+            print(f"Loading reference Keras model from: {keras_path}")
+            generator.reset()
+            keras_preds = load_model(str(keras_path)).predict(generator, steps=steps, verbose=1)
+            keras_pred = np.argmax(keras_preds[:generator.samples], axis=1)
+            keras_acc = float(np.mean(keras_pred == y_true))
+            agreement = float(np.mean(keras_pred == y_pred))
+            print(f"\n{'backend':<10} {'accuracy':>9} {'delta':>9}")
+            print(f"{'keras':<10} {keras_acc:>9.4f} {0.0:>+9.4f}")
+            print(f"{args.backend:<10} {acc:>9.4f} {acc - keras_acc:>+9.4f}")
+            print(f"Top-1 agreement with keras: {agreement:.4f}")
+            print(f"Max abs probability difference: {np.max(np.abs(keras_preds[:generator.samples] - preds)):.5f}")
 
     # Print the class indices mapping so you know which class maps to which index
     print('\nClass indices mapping (class_name -> index):')
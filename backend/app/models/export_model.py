@@ -0,0 +1,144 @@
+"""Export the trained Keras dish classifier for CPU serving with TFLite and/or ONNX Runtime.
+
+Optional post-training quantization:
+  float16  - weights stored as float16 (TFLite only), ~2x smaller, near-identical accuracy
+  int8     - weights and activations quantized to int8 using a calibration set
+             sampled from the dataset (TFLite + ONNX), ~4x smaller, fastest on CPU
+
+Float32 inputs and outputs are kept in every variant, so DishPredictor can
+switch backend (PREDICT_BACKEND=tflite|onnx) without changing preprocessing.
+
+Usage:
+  python -m app.models.export_model --format all
+  python -m app.models.export_model --format tflite --quantize int8 --calibration-samples 200
+
+ONNX export needs tf2onnx, ONNX int8 quantization needs onnxruntime; both are
+listed in requirements-export.txt.
+"""
+import argparse
+import random
+from pathlib import Path
+
+import numpy as np
+
+from app.models.prediction import MODEL_DIR, MODEL_PATH, preprocess_image
+
+DATASET_PATH = Path(__file__).parent.parent.parent.parent / "dataset"
+IMAGE_SUFFIXES = ('.jpg', '.jpeg', '.png')
+
+
+def calibration_images(count, seed=0):
+    """Sample up to ``count`` preprocessed images, spread across all classes."""
+    per_class = [
+        [p for p in d.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES]
+        for d in sorted(DATASET_PATH.iterdir()) if d.is_dir()
+    ]
+    rng = random.Random(seed)
+    for images in per_class:
+        rng.shuffle(images)
+    # round-robin over classes so every dish contributes to the activation ranges
+    picked = []
+    i = 0
+    while len(picked) < count and any(i < len(images) for images in per_class):
+        for images in per_class:
+            if i < len(images) and len(picked) < count:
+                picked.append(images[i])
+        i += 1
+    if not picked:
+        raise RuntimeError(f"No calibration images found under {DATASET_PATH}")
+    print(f"Using {len(picked)} calibration images from {DATASET_PATH}")
+    for path in picked:
+        yield preprocess_image(str(path))
+
+
+def output_path(output_dir, suffix, quantize):
+    name = "model" if quantize == "none" else f"model_{quantize}"
+    return Path(output_dir) / f"{name}{suffix}"
+
+
+def export_tflite(model, output_dir, quantize, calibration_samples):
+    import tensorflow as tf
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantize == "float16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantize == "int8":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = lambda: ([x] for x in calibration_images(calibration_samples))
+    tflite_model = converter.convert()
+    path = output_path(output_dir, ".tflite", quantize)
+    path.write_bytes(tflite_model)
+    return path
+
+
+class _CalibrationReader:
+    """onnxruntime.quantization CalibrationDataReader over dataset samples."""
+
+    def __init__(self, input_name, count):
+        self.input_name = input_name
+        self._it = calibration_images(count)
+
+    def get_next(self):
+        batch = next(self._it, None)
+        return None if batch is None else {self.input_name: batch}
+
+
+def export_onnx(model, output_dir, quantize, calibration_samples):
+    import tensorflow as tf
+    import tf2onnx
+
+    float_path = output_path(output_dir, ".onnx", "none")
+    spec = (tf.TensorSpec((None, 224, 224, 3), tf.float32, name="input"),)
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=13, output_path=str(float_path))
+    if quantize == "none":
+        return float_path
+    if quantize != "int8":
+        print(f"ONNX export does not support {quantize} quantization; wrote float32 model only")
+        return float_path
+
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+    prepped = output_path(output_dir, ".prep.onnx", "none")
+    quant_pre_process(str(float_path), str(prepped))
+    path = output_path(output_dir, ".onnx", quantize)
+    quantize_static(
+        str(prepped), str(path), _CalibrationReader("input", calibration_samples),
+        quant_format=QuantFormat.QDQ, activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+    )
+    prepped.unlink(missing_ok=True)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the dish classifier to TFLite / ONNX')
+    parser.add_argument('--model', type=str, default=str(MODEL_PATH),
+                        help='Path to the saved Keras model (default: models/model.keras)')
+    parser.add_argument('--format', type=str, default='tflite', choices=['tflite', 'onnx', 'all'])
+    parser.add_argument('--quantize', type=str, default='none', choices=['none', 'float16', 'int8'])
+    parser.add_argument('--calibration-samples', type=int, default=100,
+                        help='Dataset images used to calibrate int8 activation ranges')
+    parser.add_argument('--output-dir', type=str, default=str(MODEL_DIR))
+    args = parser.parse_args()
+
+    from tensorflow.keras.models import load_model
+    print(f"Loading model from: {args.model}")
+    model = load_model(args.model)
+
+    written = []
+    if args.format in ('tflite', 'all'):
+        written.append(export_tflite(model, args.output_dir, args.quantize, args.calibration_samples))
+    if args.format in ('onnx', 'all'):
+        written.append(export_onnx(model, args.output_dir, args.quantize, args.calibration_samples))
+
+    keras_size = Path(args.model).stat().st_size
+    print(f"\n{'file':<40} {'size MB':>9} {'vs keras':>9}")
+    print(f"{Path(args.model).name:<40} {keras_size / 1e6:>9.2f} {1.0:>8.2f}x")
+    for path in written:
+        size = path.stat().st_size
+        print(f"{path.name:<40} {size / 1e6:>9.2f} {size / keras_size:>8.2f}x")
+    print("\nServe with PREDICT_BACKEND=tflite|onnx (and PREDICT_MODEL_PATH for quantized files).")
+    print("Check accuracy with: python -m app.models.evaluate_model --backend <backend> --model <file> --compare")
+
+
+if __name__ == '__main__':
+    main()
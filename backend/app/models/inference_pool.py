@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Model replica owned by this process (used by process-pool workers)
+_worker_predictor = None
+
+
+def _init_worker(intra_op_threads, inter_op_threads, warmup_batch_sizes):
+    """Process pool initializer: load and warm one model replica per worker."""
+    global _worker_predictor
+    from .prediction import DishPredictor
+    _worker_predictor = DishPredictor(num_threads=intra_op_threads, inter_op_threads=inter_op_threads)
+    _worker_predictor.warmup(warmup_batch_sizes)
+    logger.info(f"Inference worker {os.getpid()} ready")
+
+
+def _predictor_info(predictor):
+    return {
+        "pid": os.getpid(),
+        "backend": predictor.backend_name,
+        "model_path": str(predictor.model_path),
+        "warmup_ms": predictor.warmup_ms,
+    }
+
+
+def _worker_info():
+    return _predictor_info(_worker_predictor)
+
+
+def _worker_predict_batch(items):
+    return _worker_predictor.predict_batch(items)
+
+
+class InferenceExecutor:
+    """Run blocking model inference outside the event loop.
+
+    mode="thread": a thread pool sharing one in-process model. The inference
+    runtimes release the GIL while running, so this keeps the API responsive
+    with the lowest memory cost.
+
+    mode="process": a process pool where every worker loads its own model
+    replica. Uses more memory but isolates inference CPU from the API process.
+    """
+
+    def __init__(self, mode="thread", workers=1, intra_op_threads=0, inter_op_threads=0,
+                 warmup_batch_sizes=(1,)):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown inference executor mode: {mode}")
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.warmup_batch_sizes = tuple(warmup_batch_sizes)
+        self.predictor = None
+        self.worker_info = []
+        self._pool = None
+
+    def start(self):
+        """Create the pool and load + warm the model(s) before returning."""
+        if self._pool is not None:
+            return
+        if self.mode == "thread":
+            from .prediction import DishPredictor
+            self.predictor = DishPredictor(
+                num_threads=self.intra_op_threads, inter_op_threads=self.inter_op_threads
+            )
+            self.predictor.warmup(self.warmup_batch_sizes)
+            self.worker_info = [_predictor_info(self.predictor)]
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="inference"
+            )
+        else:
+            # spawn (not fork): the API process already runs an event loop and threads
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.intra_op_threads, self.inter_op_threads, self.warmup_batch_sizes),
+            )
+            # Workers are spawned lazily; make them all start, load and warm
+            # their model now, so the first request does not pay for it.
+            futures = [self._pool.submit(_worker_info) for _ in range(self.workers)]
+            self.worker_info = [f.result() for f in futures]
+        logger.info(
+            f"Inference executor started: mode={self.mode} workers={self.workers} "
+            f"intra_op_threads={self.intra_op_threads or 'default'}"
+        )
+
+    async def predict_batch(self, items):
+        """Await predictions for a list of images without blocking the loop."""
+        loop = asyncio.get_running_loop()
+        if self.mode == "thread":
+            return await loop.run_in_executor(self._pool, self.predictor.predict_batch, items)
+        return await loop.run_in_executor(self._pool, _worker_predict_batch, items)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -1,7 +1,14 @@
+from collections import defaultdict
+from difflib import SequenceMatcher
 from pathlib import Path
+import functools
+import hashlib
 import logging
 import math
+import os
+import pickle
 import re
+import threading
 
 logger = logging.getLogger(__name__)
 
@@ -10,6 +17,10 @@ MODEL_DIR = Path(__file__).parent
 # Old fixed paths (kept for backward compatibility)
 XLSX_PATH = MODEL_DIR / "nutrients.xlsx"
 CSV_PATH = MODEL_DIR / "nutrients.csv"
+# Compiled snapshot of the parsed table (see build_snapshot / `python -m app.models.nutrients`).
+# Bump SNAPSHOT_FORMAT whenever the table layout changes.
+SNAPSHOT_PATH = Path(os.getenv("NUTRIENTS_SNAPSHOT_PATH", str(MODEL_DIR / "nutrients.snapshot.pkl")))
+SNAPSHOT_FORMAT = 1
 
 def _find_nutrients_file():
     """Find any file in models dir that likely contains nutrients data.
@@ -27,6 +38,9 @@ def _find_nutrients_file():
         # Skip temporary/lock files created by Excel (they start with '~$')
         if name.startswith('~$'):
             continue
+        # Skip our own compiled snapshot
+        if p == SNAPSHOT_PATH or name.endswith(('.pkl', '.tmp')):
+            continue
         if 'nutrient' in name:
             # prefer excel over csv
             if p.suffix.lower() in ('.xlsx', '.xls'):
@@ -45,14 +59,151 @@ def _find_nutrients_file():
 
     return None
 
-_cache = None
+# The active table build: a NutrientIndex holding the table, its lookup
+# structures and its generation number. Reloads build a complete new index and
+# swap this single reference, so readers never see a half-built table.
+_current = None
+_generation = 0
+_load_lock = threading.Lock()
+_reloader = None
+
+# Seconds between checks of the nutrients file for changes (0 disables hot reload)
+NUTRIENTS_RELOAD_INTERVAL = float(os.getenv("NUTRIENTS_RELOAD_INTERVAL", "30"))
+
+# Precompiled dish-name normalizers
+_PARENS_RE = re.compile(r"\(.*?\)")
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_name(s, remove_parens=False):
+    """Normalize a dish name into a canonical key: 'Paya (Beef)' -> 'paya_beef'."""
+    if s is None:
+        return ''
+    t = str(s).strip().lower()
+    if remove_parens:
+        # remove parentheses and their contents
+        t = _PARENS_RE.sub(" ", t)
+    # replace any run of non-alphanumeric characters with one underscore
+    return _NON_ALNUM_RE.sub("_", t).strip('_')
+
+
+# Spelling variants seen in the spreadsheet and the model's class names. Every
+# token is mapped to one canonical spelling on both the table and query side.
+TOKEN_ALIASES = {
+    "gosht": "ghost",
+    "aaloo": "aloo",
+    "alu": "aloo",
+    "channa": "chana",
+    "chanay": "chana",
+    "jaman": "jamun",
+    "beaf": "beef",
+    "korma": "qorma",
+    "dal": "daal",
+    "vegies": "veggies",
+    "sabzi": "veggies",
+    "gappy": "gappay",
+}
+
+# Whole-name synonyms: model class name -> dish name used in the spreadsheet
+NAME_ALIASES = {
+    "chai": "tea",
+    "paani_puri": "gol_gappy",
+    "pani_puri": "gol_gappy",
+    "daal": "red_lentil",
+    "leafy_vegies": "leafy_sabzi",
+    "biryani": "biryani_chicken",
+    "qorma": "chicken_qorma",
+}
+
+# Canonical numeric nutrient fields and the spreadsheet headers that feed them.
+# Headers are matched exactly after normalize_name(), never by substring, so
+# e.g. "Saturated Fat (g)" is not mistaken for total fats.
+NUTRIENT_FIELDS = ("calories", "protein", "carbs", "fats")
+NUTRIENT_COLUMN_ALIASES = {
+    "calories": "calories", "calories_kcal": "calories", "calorie": "calories",
+    "kcal": "calories", "energy_kcal": "calories",
+    "protein": "protein", "protein_g": "protein", "proteins": "protein", "proteins_g": "protein",
+    "carbs": "carbs", "carbs_g": "carbs", "carb": "carbs", "carb_g": "carbs",
+    "carbohydrates": "carbs", "carbohydrates_g": "carbs",
+    "carbohydrate": "carbs", "carbohydrate_g": "carbs",
+    "fats": "fats", "fats_g": "fats", "fat": "fats", "fat_g": "fats",
+    "total_fat": "fats", "total_fat_g": "fats",
+}
+# Column describing the serving a row's values refer to, e.g. "Per person (~150g)"
+SERVING_COLUMN = "serving"
+# Grams assumed for one serving when the row does not say (spreadsheet basis is 100g)
+DEFAULT_SERVING_GRAMS = 100.0
+_GRAMS_RE = re.compile(r"(\d+(?:\.\d+)?)\s*g\b")
+
+
+def canonical_nutrient(header):
+    """Map a nutrient column header to its NUTRIENT_FIELDS name, or None."""
+    return NUTRIENT_COLUMN_ALIASES.get(normalize_name(header))
+
+
+def _to_number(v):
+    """Finite float value of ``v``, or None (NaN and +/-inf count as absent)."""
+    if v is None or isinstance(v, bool):
+        return None
+    if isinstance(v, (int, float)):
+        num = float(v)
+    else:
+        try:
+            num = float(str(v).replace(',', '').strip())
+        except ValueError:
+            return None
+    return num if math.isfinite(num) else None
+
+
+def normalize_nutrients(raw):
+    """Convert a free-form nutrients dict into the canonical numeric schema.
+
+    Returns {field: float} for every NUTRIENT_FIELDS entry (0.0 when absent,
+    not numeric or not finite). Keys are mapped with canonical_nutrient(); the first numeric
+    value found for a field wins.
+    """
+    out = {}
+    if isinstance(raw, dict):
+        for k, v in raw.items():
+            field = canonical_nutrient(k)
+            if field is None or field in out:
+                continue
+            num = _to_number(v)
+            if num is not None:
+                out[field] = num
+    return {field: out.get(field, 0.0) for field in NUTRIENT_FIELDS}
+
+
+def serving_grams(row):
+    """Grams in one serving of a table row, parsed from its Serving column."""
+    for k, v in row.items():
+        if normalize_name(k) == SERVING_COLUMN and isinstance(v, str):
+            m = _GRAMS_RE.search(v.lower())
+            if m:
+                return float(m.group(1))
+    return DEFAULT_SERVING_GRAMS
+
 
-try:
-    import pandas as _pd
-    _PANDAS_AVAILABLE = True
-except Exception:
-    _pd = None
-    _PANDAS_AVAILABLE = False
+# Memoized lookups per table build, and the difflib cutoff for fuzzy matches
+LOOKUP_MEMO_SIZE = 4096
+FUZZY_CUTOFF = 0.6
+
+# pandas is imported on first load, not at module import: it is only needed to
+# parse the spreadsheet and adds noticeably to process start-up.
+_pd = None
+_PANDAS_AVAILABLE = None
+
+
+def _import_pandas():
+    global _pd, _PANDAS_AVAILABLE
+    if _PANDAS_AVAILABLE is None:
+        try:
+            import pandas
+            _pd = pandas
+            _PANDAS_AVAILABLE = True
+        except Exception:
+            _PANDAS_AVAILABLE = False
+    return _PANDAS_AVAILABLE
 
 
 def _load_table():
@@ -61,23 +212,202 @@ def _load_table():
     Supports Excel (.xlsx/.xls) via pandas if available, or CSV via csv.DictReader.
     If no file or required library missing, returns empty dict.
     """
-    global _cache
-    if _cache is not None:
-        return _cache
+    return _get_index().table
+
+
+def preload_table():
+    """Parse the nutrients file ahead of the first lookup (e.g. at startup)."""
+    _get_index()
+
+
+def get_table_generation():
+    """Generation number of the active table build (increments on every reload)."""
+    return _get_index().generation
+
+
+def _get_index():
+    global _current
+    current = _current
+    if current is not None:
+        return current
+    # The table may be warmed in a background thread at startup while a
+    # request asks for it; only one of them parses the file.
+    with _load_lock:
+        if _current is None:
+            try:
+                _current = _new_build(_find_nutrients_file())
+            except Exception:
+                # serve without nutrients for now; with no source stamp the
+                # reloader's next poll tries the file again
+                logger.exception("Nutrient table load failed; retrying on the next reload poll")
+                _current = NutrientIndex({}, generation=_generation)
+            _start_reloader()
+    return _current
+
+
+def _new_build(path):
+    global _generation
+    table = _build_table(path)
+    _generation += 1
+    index = NutrientIndex(
+        table,
+        generation=_generation,
+        source_stamp=_source_stamp(path) if path else None,
+        source_hash=_file_hash(path) if path else None,
+    )
+    logger.info("Nutrient table generation %d active (%d entries)", index.generation, len(table))
+    return index
+
+
+def reload_table(force=False):
+    """Rebuild the table if the nutrients file changed, then swap it in atomically.
+
+    The file is considered changed when its name, size or mtime differ and its
+    content hash differs too (touching the file alone does not reload).
+    Returns True if a new generation was activated. Raises if the file cannot
+    be parsed; the current table and its source stamp are then left as they
+    are, so the next call tries again. A missing file (e.g. mid-save by an
+    editor that writes a temp file and renames it) also keeps the current
+    table.
+    """
+    global _current
+    with _load_lock:
+        current = _current
+        path = _find_nutrients_file()
+        if path is None and current is not None:
+            if current.source_stamp is not None:
+                logger.warning("Nutrients file not found; keeping table generation %d", current.generation)
+            return False
+        if current is not None and not force:
+            stamp = _source_stamp(path)
+            if stamp == current.source_stamp:
+                return False
+            if _file_hash(path) == current.source_hash:
+                current.source_stamp = stamp
+                return False
+        _current = _new_build(path)
+        return True
+
+
+def _file_hash(path):
+    h = hashlib.sha256()
+    with path.open('rb') as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class _Reloader(threading.Thread):
+    """Daemon thread that polls the nutrients file and reloads it when it changes."""
+
+    def __init__(self, interval):
+        super().__init__(name="nutrients-reloader", daemon=True)
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                reload_table()
+            except Exception:
+                logger.exception("Nutrient table reload failed; keeping the current table")
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def _start_reloader():
+    global _reloader
+    if _reloader is None and NUTRIENTS_RELOAD_INTERVAL > 0:
+        _reloader = _Reloader(NUTRIENTS_RELOAD_INTERVAL)
+        _reloader.start()
+
+
+def stop_reloader():
+    global _reloader
+    if _reloader is not None:
+        _reloader.stop()
+        _reloader = None
+
+
+def _build_table(path):
+    """Build the table from the snapshot if it is fresh, else from the source file."""
+    if path is None:
+        logger.info("No nutrients file found in models folder")
+        return {}
 
-    _cache = {}
+    table = read_snapshot(path)
+    if table is not None:
+        return table
+    table = _parse_table(path)
+    if not table:
+        raise ValueError(f"No nutrient rows parsed from {path}")
+    # refresh the snapshot so the next process start skips the spreadsheet
+    write_snapshot(table, path)
+    return table
 
-    path = _find_nutrients_file()
 
-    if path is None:
-        logger.info("No nutrients file found in models folder")
-        return _cache
+def _source_stamp(path):
+    st = path.stat()
+    return {"source": path.name, "source_size": st.st_size, "source_mtime_ns": st.st_mtime_ns}
+
+
+def read_snapshot(source, snapshot_path=None):
+    """Return the table stored in the snapshot, or None if missing or stale.
+
+    A snapshot is only used if it was built from the same source file (name,
+    size and mtime) with the current SNAPSHOT_FORMAT.
+    """
+    snapshot_path = Path(snapshot_path or SNAPSHOT_PATH)
+    try:
+        with snapshot_path.open('rb') as fh:
+            data = pickle.load(fh)
+    except FileNotFoundError:
+        return None
+    except Exception as exc:
+        logger.warning("Ignoring unreadable nutrients snapshot %s: %s", snapshot_path, exc)
+        return None
+    stamp = _source_stamp(source)
+    if data.get("format") != SNAPSHOT_FORMAT or any(data.get(k) != v for k, v in stamp.items()):
+        logger.info("Nutrients snapshot %s is stale for %s; parsing source", snapshot_path, source.name)
+        return None
+    logger.info("Loaded %d nutrient entries from snapshot %s", len(data["table"]), snapshot_path)
+    return data["table"]
+
+
+def write_snapshot(table, source, snapshot_path=None):
+    """Atomically write ``table`` as a versioned pickle snapshot of ``source``."""
+    snapshot_path = Path(snapshot_path or SNAPSHOT_PATH)
+    data = {"format": SNAPSHOT_FORMAT, **_source_stamp(source), "table": table}
+    tmp = snapshot_path.with_name(f"{snapshot_path.name}.{os.getpid()}.tmp")
+    try:
+        with tmp.open('wb') as fh:
+            pickle.dump(data, fh, protocol=5)
+        os.replace(tmp, snapshot_path)
+        logger.info("Wrote nutrients snapshot %s (%d entries)", snapshot_path, len(table))
+        return snapshot_path
+    except Exception as exc:
+        logger.warning("Could not write nutrients snapshot %s: %s", snapshot_path, exc)
+        tmp.unlink(missing_ok=True)
+        return None
+
+
+def _parse_table(path):
+    """Parse the nutrients spreadsheet/CSV into a new table dict.
+
+    Raises if the file cannot be read (e.g. caught halfway through a save), so
+    a reload never swaps in an empty or partial table.
+    """
+    table = {}
+    try:
+        import numpy as _np
+    except Exception:
+        _np = None
 
     try:
         if path.suffix.lower() in ('.xlsx', '.xls'):
-            if not _PANDAS_AVAILABLE:
-                logger.warning("Pandas not available: cannot read Excel nutrients file %s", path)
-                return _cache
+            if not _import_pandas():
+                raise RuntimeError(f"Pandas not available: cannot read Excel nutrients file {path}")
             df = _pd.read_excel(path)
             rows = df.to_dict(orient='records')
         else:
@@ -87,20 +417,6 @@ def _load_table():
                 reader = csv.DictReader(fh)
                 rows = [r for r in reader]
 
-        # Helper: normalize dish names into a canonical key
-        def _normalize(s, remove_parens=False):
-            if s is None:
-                return ''
-            t = str(s).strip().lower()
-            if remove_parens:
-                # remove parentheses and their contents
-                t = re.sub(r"\(.*?\)", " ", t)
-            # replace any non-alphanumeric characters with underscore
-            t = re.sub(r"[^a-z0-9]+", "_", t)
-            # collapse multiple underscores
-            t = re.sub(r"_+", "_", t)
-            return t.strip('_')
-
         # Expect a column identifying the dish name. Try common names.
         for r in rows:
             # Determine dish name column
@@ -122,8 +438,8 @@ def _load_table():
             # and base (remove parenthetical descriptors). Both will point to the
             # same nutrient dict so lookups like 'paya', 'Paya', 'paya(beef)'
             # will resolve.
-            dish_full = _normalize(dish_name_raw, remove_parens=False)
-            dish_base = _normalize(dish_name_raw, remove_parens=True)
+            dish_full = normalize_name(dish_name_raw, remove_parens=False)
+            dish_base = normalize_name(dish_name_raw, remove_parens=True)
 
             # Remove the identifying column from nutrient data
             nutrient_data = {k: v for k, v in r.items() if k != dish_key}
@@ -172,11 +488,10 @@ def _load_table():
                 # Convert numpy/pandas scalar types to native Python types if possible
                 try:
                     # e.g., numpy.int64, numpy.float64
-                    import numpy as _np
-                    if isinstance(v, (_np.integer, _np.int_)):
+                    if isinstance(v, _np.integer):
                         cleaned[k] = int(v)
                         continue
-                    if isinstance(v, (_np.floating, _np.float_)):
+                    if isinstance(v, _np.floating):
                         fv = float(v)
                         if math.isnan(fv):
                             cleaned[k] = None
@@ -191,72 +506,128 @@ def _load_table():
 
             # Store under both normalized keys (avoid overwriting existing entries)
             if dish_full:
-                _cache.setdefault(dish_full, cleaned)
+                table.setdefault(dish_full, cleaned)
             if dish_base and dish_base != dish_full:
-                _cache.setdefault(dish_base, cleaned)
+                table.setdefault(dish_base, cleaned)
 
-        logger.info("Loaded %d nutrient entries from %s", len(_cache), path)
+        logger.info("Loaded %d nutrient entries from %s", len(table), path)
     except Exception as exc:
-        logger.exception("Failed to load nutrients file %s: %s", path, exc)
+        logger.error("Failed to load nutrients file %s: %s", path, exc)
+        raise
+
+    return table
+
+
+def _canonical(key):
+    """Apply TOKEN_ALIASES to every token of a normalized key."""
+    return '_'.join(TOKEN_ALIASES.get(t, t) for t in key.split('_'))
+
 
-    return _cache
+def _trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NutrientIndex:
+    """Prebuilt lookup structure over a nutrients table.
+
+    Resolution order for a dish name: exact normalized key (full, then without
+    parenthetical descriptor), alias-canonical key, whole-name synonym, then a
+    fuzzy match. Fuzzy matching uses a trigram inverted index to pick a few
+    candidates and only scores those with difflib, instead of scanning every
+    key. Results (including misses) are memoized per input string, so the memo
+    is dropped together with the index when a new table generation is loaded.
+    """
+
+    def __init__(self, table, generation=0, source_stamp=None, source_hash=None):
+        self.table = table
+        self.generation = generation
+        self.source_stamp = source_stamp
+        self.source_hash = source_hash
+        self._canonical = {}
+        self._postings = defaultdict(list)
+        for key in table:
+            self._canonical.setdefault(_canonical(key), key)
+        for key in table:
+            for gram in _trigrams(key):
+                self._postings[gram].append(key)
+        self.lookup = functools.lru_cache(maxsize=LOOKUP_MEMO_SIZE)(self._resolve)
+
+    def _exact(self, key):
+        if key in self.table:
+            return key
+        return self._canonical.get(_canonical(key))
+
+    def _resolve(self, dish_name):
+        key_full = normalize_name(dish_name)
+        key_base = normalize_name(dish_name, remove_parens=True)
+        for key in (key_full, key_base):
+            if not key:
+                continue
+            found = self._exact(key)
+            if found is None and key in NAME_ALIASES:
+                found = self._exact(NAME_ALIASES[key])
+            if found is not None:
+                return self.table[found]
+        found = self._fuzzy(key_full)
+        return self.table[found] if found is not None else None
+
+    def _fuzzy(self, key, n_candidates=10):
+        if not key:
+            return None
+        # count shared trigrams per table key, score only the best candidates
+        grams = _trigrams(key)
+        shared = defaultdict(int)
+        for gram in grams:
+            for candidate in self._postings.get(gram, ()):
+                shared[candidate] += 1
+        if not shared:
+            return None
+        candidates = sorted(shared, key=shared.get, reverse=True)[:n_candidates]
+        best, best_ratio = None, FUZZY_CUTOFF
+        matcher = SequenceMatcher()
+        matcher.set_seq2(key)
+        for candidate in candidates:
+            matcher.set_seq1(candidate)
+            if (matcher.real_quick_ratio() >= best_ratio
+                    and matcher.quick_ratio() >= best_ratio
+                    and matcher.ratio() >= best_ratio):
+                best, best_ratio = candidate, matcher.ratio()
+        return best
 
 
 def get_nutrients_for(dish_name):
     """Return nutrients dict for a dish name (normalized), or None if not found."""
+    return get_nutrients_versioned(dish_name)[0]
+
+
+def get_nutrients_versioned(dish_name):
+    """Return (nutrients dict or None, table generation it came from)."""
+    index = _get_index()
     if not dish_name:
-        return None
-    table = _load_table()
-    def _lookup_key(s):
-        if not s:
-            return ''
-        s = str(s)
-        # try exact normalized forms: full and base
-        k_full = re.sub(r"[^a-z0-9]+", "_", s.strip().lower())
-        k_full = re.sub(r"_+", "_", k_full).strip('_')
-        k_base = re.sub(r"\(.*?\)", " ", s.strip().lower())
-        k_base = re.sub(r"[^a-z0-9]+", "_", k_base)
-        k_base = re.sub(r"_+", "_", k_base).strip('_')
-        return k_full, k_base
-
-    key, key_base = _lookup_key(dish_name)
-    # direct lookup
-    if key in table:
-        return table.get(key)
-    if key_base in table:
-        return table.get(key_base)
-    # direct lookup
-    if key in table:
-        return table.get(key)
-
-    # quick normalizations
-    alt = key.replace('ghost', 'gosht')
-    if alt in table:
-        return table.get(alt)
-    alt2 = key.replace('gosht', 'ghost')
-    if alt2 in table:
-        return table.get(alt2)
-
-    # remove punctuation and parentheses
-    key_clean = re.sub(r"[^a-z0-9_]", "", key)
-    if key_clean in table:
-        return table.get(key_clean)
-
-    # fuzzy match against available keys
+        return None, index.generation
     try:
-        import difflib
-        candidates = difflib.get_close_matches(key, list(table.keys()), n=1, cutoff=0.6)
-        if candidates:
-            return table.get(candidates[0])
+        return index.lookup(str(dish_name)), index.generation
     except Exception:
-        pass
-
-    return None
-
-
-# Eagerly load table at import time so a running server (with reload) will pick up files
-try:
-    _load_table()
-except Exception:
-    # non-fatal; loader logs will report issues
-    pass
+        logger.exception("Nutrient lookup failed for %r", dish_name)
+        return None, index.generation
+
+
+def build_snapshot(snapshot_path=None):
+    """Parse the current nutrients file and write its snapshot. Returns the path."""
+    source = _find_nutrients_file()
+    if source is None:
+        raise FileNotFoundError("No nutrients file found in models folder")
+    table = _parse_table(source)
+    if not table:
+        raise ValueError(f"No nutrient rows parsed from {source}")
+    return write_snapshot(table, source, snapshot_path)
+
+
+if __name__ == '__main__':
+    import argparse
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Compile the nutrients spreadsheet into a binary snapshot')
+    parser.add_argument('--output', type=str, default=None, help=f'Snapshot path (default: {SNAPSHOT_PATH})')
+    args = parser.parse_args()
+    print(f"Snapshot written to {build_snapshot(args.output)}")
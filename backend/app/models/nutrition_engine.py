@@ -0,0 +1,145 @@
+import logging
+import math
+import threading
+
+import numpy as np
+
+from .nutrients import NUTRIENT_FIELDS, _get_index, canonical_nutrient, serving_grams
+
+logger = logging.getLogger(__name__)
+
+# Portion units accepted for meal items, as grams per unit (None = servings)
+UNIT_GRAMS = {
+    "serving": None,
+    "servings": None,
+    "g": 1.0,
+    "gram": 1.0,
+    "grams": 1.0,
+    "kg": 1000.0,
+    "oz": 28.349523125,
+}
+
+
+class NutritionEngine:
+    """Dense dish x nutrient matrix over one nutrient table build.
+
+    Every table row becomes one matrix row holding its per-serving values for
+    NUTRIENT_FIELDS (missing values are 0), plus the grams in one serving.
+    Portions are converted to servings and all items of one or many meals are
+    totalled with a single matrix operation.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.generation = index.generation
+        self.columns = NUTRIENT_FIELDS
+        rows = {}
+        for row in index.table.values():
+            # full and base keys share the same row dict
+            rows.setdefault(id(row), row)
+        self._row_ids = {}
+        matrix = np.zeros((len(rows), len(self.columns)), dtype=np.float64)
+        grams = np.empty(len(rows), dtype=np.float64)
+        col_of = {name: j for j, name in enumerate(self.columns)}
+        for i, (rid, row) in enumerate(rows.items()):
+            self._row_ids[rid] = i
+            grams[i] = serving_grams(row)
+            for header, value in row.items():
+                field = canonical_nutrient(header)
+                if field is None or isinstance(value, bool):
+                    continue
+                if isinstance(value, (int, float)) and not np.isnan(value):
+                    matrix[i, col_of[field]] = value
+        self.matrix = matrix
+        self.serving_grams = grams
+
+    def row_for(self, dish):
+        """Matrix row for a dish name, or None if the dish is unknown."""
+        row = self.index.lookup(str(dish)) if dish else None
+        return None if row is None else self._row_ids.get(id(row))
+
+    def _servings(self, rows, quantities, units):
+        """Vectorized portion -> servings conversion."""
+        grams_per_unit = np.array(
+            [np.nan if UNIT_GRAMS[u] is None else UNIT_GRAMS[u] for u in units], dtype=np.float64
+        )
+        quantities = np.asarray(quantities, dtype=np.float64)
+        by_weight = ~np.isnan(grams_per_unit)
+        servings = quantities.copy()
+        servings[by_weight] = (
+            quantities[by_weight] * grams_per_unit[by_weight] / self.serving_grams[rows[by_weight]]
+        )
+        return servings
+
+    def compute(self, meals):
+        """Totals for many meals at once.
+
+        ``meals`` is a list of meals, each a list of items
+        ``{"dish": str, "quantity": float = 1, "unit": "serving" | "g" | "kg" | "oz"}``.
+        Returns (totals, items): an (n_meals x n_nutrients) array and, per meal,
+        the resolved items with their scaled nutrients. Unknown dishes are kept
+        in ``items`` with ``"matched": False`` and contribute nothing.
+        """
+        meal_ids, rows, quantities, units, refs = [], [], [], [], []
+        resolved = [[] for _ in meals]
+        for m, items in enumerate(meals):
+            for item in items:
+                if not isinstance(item, dict):
+                    raise ValueError("Each item must be an object with a dish")
+                unit = str(item.get("unit") or "serving").lower()
+                if unit not in UNIT_GRAMS:
+                    raise ValueError(f"Unknown portion unit: {unit}")
+                try:
+                    quantity = float(item.get("quantity", 1) or 0)
+                except (TypeError, ValueError):
+                    raise ValueError("Portion quantity must be a number")
+                if not math.isfinite(quantity) or quantity < 0:
+                    raise ValueError("Portion quantity must be a finite number >= 0")
+                entry = {"dish": item.get("dish"), "quantity": quantity, "unit": unit}
+                resolved[m].append(entry)
+                row = self.row_for(item.get("dish"))
+                if row is None:
+                    entry["matched"] = False
+                    continue
+                entry["matched"] = True
+                meal_ids.append(m)
+                rows.append(row)
+                quantities.append(quantity)
+                units.append(unit)
+                refs.append(entry)
+
+        totals = np.zeros((len(meals), len(self.columns)), dtype=np.float64)
+        if rows:
+            rows = np.asarray(rows, dtype=np.intp)
+            servings = self._servings(rows, quantities, units)
+            per_item = self.matrix[rows] * servings[:, np.newaxis]
+            np.add.at(totals, np.asarray(meal_ids, dtype=np.intp), per_item)
+            for entry, s, values in zip(refs, servings.tolist(), per_item.round(2).tolist()):
+                entry["servings"] = round(s, 3)
+                entry["nutrients"] = dict(zip(self.columns, values))
+        return totals, resolved
+
+    def meal_totals(self, items):
+        """Totals for one meal as {nutrient: value}, plus the resolved items."""
+        totals, resolved = self.compute([items])
+        return self.as_dict(totals[0]), resolved[0]
+
+    def as_dict(self, values):
+        return {name: round(float(v), 2) for name, v in zip(self.columns, values)}
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """Engine for the active nutrient table; rebuilt when the table reloads."""
+    global _engine
+    index = _get_index()
+    engine = _engine
+    if engine is None or engine.generation != index.generation:
+        with _engine_lock:
+            if _engine is None or _engine.generation != index.generation:
+                _engine = NutritionEngine(index)
+            engine = _engine
+    return engine
@@ -1,15 +1,44 @@
-from tensorflow.keras.models import load_model
-from tensorflow.keras.preprocessing import image
+from PIL import Image
 import numpy as np
 from pathlib import Path
+import hashlib
+import io
 import logging
+import os
+import threading
+import time
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Get the absolute path to the model file
-MODEL_PATH = Path(__file__).parent / "model.keras"
+MODEL_DIR = Path(__file__).parent
+MODEL_PATH = MODEL_DIR / "model.keras"
+
+# Inference backend: "keras" (model.keras), "tflite" (model.tflite) or
+# "onnx" (model.onnx). Exported files come from export_model.py; the onnx and
+# tflite runtimes are in requirements-backends.txt.
+# PREDICT_MODEL_PATH overrides the file used by the selected backend.
+PREDICT_BACKEND = os.getenv("PREDICT_BACKEND", "keras").lower()
+PREDICT_MODEL_PATH = os.getenv("PREDICT_MODEL_PATH", "")
+BACKEND_MODEL_FILES = {
+    "keras": "model.keras",
+    "tflite": "model.tflite",
+    "onnx": "model.onnx",
+}
+
+# Largest batch the TFLite backend allocates an interpreter for; matches the
+# micro-batcher's PREDICT_MAX_BATCH_SIZE so no batch has to be split
+TFLITE_MAX_BATCH_SIZE = int(os.getenv("PREDICT_MAX_BATCH_SIZE", "8"))
+
+# Input size expected by the model (MobileNetV2)
+IMG_SIZE = (224, 224)
+
+# How many ranked predictions to return, and the minimum confidence a
+# prediction needs to be listed in top_predictions
+PREDICT_TOP_K = int(os.getenv("PREDICT_TOP_K", "3"))
+PREDICT_MIN_CONFIDENCE = float(os.getenv("PREDICT_MIN_CONFIDENCE", "0.0"))
 
 # List of classes/dishes that the model can predict
 CLASSES = [
@@ -20,47 +49,279 @@ CLASSES = [
     "paani_puri", "paratha", "paya", "plain_white_rice", "qorma", "samosa"
 ]
 
+
+class InvalidImageError(ValueError):
+    """An upload that could not be decoded as an image."""
+
+
+def model_path_for(backend=PREDICT_BACKEND):
+    """Model file the given backend loads (honours PREDICT_MODEL_PATH)."""
+    if PREDICT_MODEL_PATH:
+        return Path(PREDICT_MODEL_PATH)
+    if backend not in BACKEND_MODEL_FILES:
+        raise ValueError(f"Unknown prediction backend: {backend}")
+    return MODEL_DIR / BACKEND_MODEL_FILES[backend]
+
+
+def model_version(path=MODEL_PATH):
+    """Short content hash of the model file; changes whenever the model does."""
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()[:16]
+
+
+def top_k_predictions(probs, k=PREDICT_TOP_K, min_confidence=PREDICT_MIN_CONFIDENCE):
+    """Turn an N x C probability matrix into one result dict per row.
+
+    Top-k selection for all rows is done in one vectorized pass: argpartition
+    picks the k best classes per row in O(C), then only those k are sorted.
+    The best class is always reported as ``dish``; ``top_predictions`` only
+    lists classes whose confidence is at least ``min_confidence``.
+    """
+    probs = np.asarray(probs)
+    if probs.ndim == 1:
+        probs = probs[np.newaxis, :]
+    k = max(1, min(k, probs.shape[1]))
+
+    top_idx = np.argpartition(probs, -k, axis=1)[:, -k:]
+    top_conf = np.take_along_axis(probs, top_idx, axis=1)
+    order = np.argsort(-top_conf, axis=1)
+    top_idx = np.take_along_axis(top_idx, order, axis=1)
+    top_conf = np.take_along_axis(top_conf, order, axis=1)
+    keep = top_conf >= min_confidence
+
+    results = []
+    for idx_row, conf_row, keep_row in zip(top_idx.tolist(), top_conf.tolist(), keep.tolist()):
+        results.append({
+            "dish": CLASSES[idx_row[0]],
+            "confidence": conf_row[0],
+            "top_predictions": [
+                {"dish": CLASSES[i], "confidence": c}
+                for i, c, ok in zip(idx_row, conf_row, keep_row)
+                if ok
+            ],
+        })
+    return results
+
+
+def preprocess_image(img):
+    """Preprocess the image to match model's requirements.
+
+    ``img`` may be a file path, raw image bytes or a binary file-like object.
+    Decoding, resizing and normalization all happen in memory.
+    """
+    try:
+        if isinstance(img, (bytes, bytearray, memoryview)):
+            img = io.BytesIO(img)
+        with Image.open(img) as pil_img:
+            # For JPEGs let the decoder downscale by 1/2, 1/4 or 1/8 while
+            # decoding, so a 12MP phone photo never gets fully decoded.
+            pil_img.draft("RGB", IMG_SIZE)
+            if pil_img.mode != "RGB":
+                pil_img = pil_img.convert("RGB")
+            # nearest matches keras.preprocessing.image.load_img used in training
+            pil_img = pil_img.resize(IMG_SIZE, Image.Resampling.NEAREST)
+            img_array = np.asarray(pil_img, dtype=np.float32)
+        img_array = np.expand_dims(img_array, axis=0)
+        img_array /= 255.0  # Normalize pixel values
+        return img_array
+    except Exception as e:
+        logger.error(f"Error preprocessing image: {e}")
+        raise
+
+
+def configure_tf_threads(intra_op_threads=0, inter_op_threads=0):
+    """Limit TensorFlow's CPU thread pools (0 keeps TensorFlow's default).
+
+    Must run before TensorFlow executes its first op in this process.
+    """
+    import tensorflow as tf
+    try:
+        if intra_op_threads:
+            tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+        if inter_op_threads:
+            tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+    except RuntimeError as e:
+        # TensorFlow was already initialized in this process
+        logger.warning(f"Could not set TensorFlow thread counts: {e}")
+
+
+class KerasBackend:
+    """Full TensorFlow/Keras model."""
+
+    name = "keras"
+
+    def __init__(self, path, num_threads=0, inter_op_threads=0):
+        configure_tf_threads(num_threads, inter_op_threads)
+        from tensorflow.keras.models import load_model
+        self.model = load_model(path)
+
+    def predict(self, batch):
+        return self.model.predict(batch, verbose=0)
+
+
+class TFLiteBackend:
+    """TFLite interpreter; uses tflite_runtime when installed, else tf.lite.
+
+    Resizing an interpreter's input re-allocates all of its tensors, and with
+    micro-batching the batch size changes almost every call. So there is one
+    interpreter per power-of-two batch size up to TFLITE_MAX_BATCH_SIZE, each
+    allocated once; a batch is zero-padded to the next size and the padding
+    rows are dropped from the output. Larger batches run in chunks.
+    """
+
+    name = "tflite"
+
+    def __init__(self, path, num_threads=0, inter_op_threads=0, max_batch_size=TFLITE_MAX_BATCH_SIZE):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            from tensorflow.lite import Interpreter
+        self._interpreter_cls = Interpreter
+        self.path = str(path)
+        self.num_threads = num_threads
+        self.batch_sizes = [1]
+        while self.batch_sizes[-1] < max(1, max_batch_size):
+            self.batch_sizes.append(self.batch_sizes[-1] * 2)
+        self._slots = {}  # batch size -> (interpreter, input details, output details, lock)
+        self._slots_lock = threading.Lock()
+        # load now so a bad model file fails at startup, not on the first request
+        self._slot(1)
+
+    def _slot(self, size):
+        with self._slots_lock:
+            slot = self._slots.get(size)
+            if slot is None:
+                interpreter = self._interpreter_cls(model_path=self.path, num_threads=self.num_threads or None)
+                inp = interpreter.get_input_details()[0]
+                if inp["shape"][0] != size:
+                    interpreter.resize_tensor_input(inp["index"], [size, *inp["shape"][1:]])
+                interpreter.allocate_tensors()
+                # A TFLite interpreter must not be invoked from several threads at once
+                slot = (interpreter, interpreter.get_input_details()[0],
+                        interpreter.get_output_details()[0], threading.Lock())
+                self._slots[size] = slot
+            return slot
+
+    def predict(self, batch):
+        n = batch.shape[0]
+        largest = self.batch_sizes[-1]
+        if n > largest:
+            return np.concatenate([self.predict(batch[i:i + largest]) for i in range(0, n, largest)])
+        size = next(b for b in self.batch_sizes if b >= n)
+        if size != n:
+            batch = np.concatenate([batch, np.zeros((size - n, *batch.shape[1:]), dtype=batch.dtype)])
+        interpreter, inp, output, lock = self._slot(size)
+        if inp["dtype"] in (np.int8, np.uint8):
+            # fully integer-quantized model: quantize the float input
+            scale, zero_point = inp["quantization"]
+            batch = np.round(batch / scale + zero_point)
+            info = np.iinfo(inp["dtype"])
+            batch = np.clip(batch, info.min, info.max).astype(inp["dtype"])
+        with lock:
+            interpreter.set_tensor(inp["index"], batch)
+            interpreter.invoke()
+            out = interpreter.get_tensor(output["index"])[:n].copy()
+        if output["dtype"] in (np.int8, np.uint8):
+            scale, zero_point = output["quantization"]
+            out = (out.astype(np.float32) - zero_point) * scale
+        return out
+
+
+class OnnxBackend:
+    """ONNX Runtime session on the CPU execution provider."""
+
+    name = "onnx"
+
+    def __init__(self, path, num_threads=0, inter_op_threads=0):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        if inter_op_threads:
+            options.inter_op_num_threads = inter_op_threads
+        self.session = ort.InferenceSession(
+            str(path), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self._input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch):
+        return self.session.run(None, {self._input_name: batch})[0]
+
+
+BACKENDS = {
+    "keras": KerasBackend,
+    "tflite": TFLiteBackend,
+    "onnx": OnnxBackend,
+}
+
+
 class DishPredictor:
-    def __init__(self):
+    def __init__(self, top_k=PREDICT_TOP_K, min_confidence=PREDICT_MIN_CONFIDENCE,
+                 backend=PREDICT_BACKEND, model_path=None, num_threads=0, inter_op_threads=0):
+        self.top_k = top_k
+        self.min_confidence = min_confidence
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown prediction backend: {backend}")
+        self.backend_name = backend
+        self.model_path = Path(model_path) if model_path else model_path_for(backend)
+        self.warmup_ms = {}
         try:
-            self.model = load_model(MODEL_PATH)
-            logger.info("Model loaded successfully")
+            self.backend = BACKENDS[backend](self.model_path, num_threads, inter_op_threads)
+            logger.info(f"Model loaded successfully ({backend}: {self.model_path})")
         except Exception as e:
             logger.error(f"Error loading model: {e}")
             raise
 
-    def preprocess_image(self, img_path):
+    def warmup(self, batch_sizes=(1,)):
+        """Run dummy batches so graph tracing and allocation happen before real traffic.
+
+        Returns (and keeps in ``warmup_ms``) the latency of each warm-up call.
+        """
+        for bs in sorted(set(batch_sizes)):
+            batch = np.zeros((bs, *IMG_SIZE, 3), dtype=np.float32)
+            start = time.perf_counter()
+            self.backend.predict(batch)
+            self.warmup_ms[bs] = round((time.perf_counter() - start) * 1000.0, 2)
+        logger.info(f"Model warm-up done: {self.warmup_ms}")
+        return self.warmup_ms
+
+    def preprocess_image(self, img):
         """Preprocess the image to match model's requirements"""
-        try:
-            img = image.load_img(img_path, target_size=(224, 224))  # Adjust size as per your model
-            img_array = image.img_to_array(img)
-            img_array = np.expand_dims(img_array, axis=0)
-            img_array = img_array / 255.0  # Normalize pixel values
-            return img_array
-        except Exception as e:
-            logger.error(f"Error preprocessing image: {e}")
-            raise
+        return preprocess_image(img)
 
-    def predict(self, img_path):
-        """Predict the dish from an image"""
+    def predict(self, img):
+        """Predict the dish from an image (path, bytes or file-like)"""
+        result = self.predict_batch([img])[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def predict_batch(self, imgs):
+        """Predict dishes for a list of images (paths, bytes or file-likes).
+
+        Each image is decoded on its own; the ones that decode go through the
+        model in a single call and are post-processed together. Returns one
+        entry per image: a result dict, or an InvalidImageError for an image
+        that could not be decoded, so one bad upload fails only its caller.
+        """
+        results = [None] * len(imgs)
+        arrays, positions = [], []
+        for pos, img in enumerate(imgs):
+            try:
+                arrays.append(self.preprocess_image(img))
+                positions.append(pos)
+            except Exception as e:
+                results[pos] = InvalidImageError(f"Invalid image: {e}")
+        if not arrays:
+            return results
         try:
-            processed_image = self.preprocess_image(img_path)
-            predictions = self.model.predict(processed_image)
-            predicted_class_index = np.argmax(predictions[0])
-            predicted_class = CLASSES[predicted_class_index]
-            confidence = float(predictions[0][predicted_class_index])
-            
-            return {
-                "dish": predicted_class,
-                "confidence": confidence,
-                "top_predictions": [
-                    {
-                        "dish": CLASSES[i],
-                        "confidence": float(predictions[0][i])
-                    }
-                    for i in np.argsort(predictions[0])[-3:][::-1]  # Top 3 predictions
-                ]
-            }
+            predictions = self.backend.predict(np.concatenate(arrays, axis=0))
         except Exception as e:
             logger.error(f"Error making prediction: {e}")
-            raise
\ No newline at end of file
+            raise
+        for pos, result in zip(positions, top_k_predictions(predictions, self.top_k, self.min_confidence)):
+            results[pos] = result
+        return results
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(data, model_version):
+    """Key a prediction by the image bytes and the model that produced it."""
+    h = hashlib.sha256()
+    h.update(model_version.encode("utf-8"))
+    h.update(b"\0")
+    h.update(data)
+    return h.hexdigest()
+
+
+class PredictionCache:
+    """LRU + TTL cache of prediction results keyed by content hash.
+
+    The in-memory tier is bounded by the total size (in bytes) of the JSON
+    encoded entries. If ``disk_dir`` is set, entries are also written there as
+    small JSON files so they survive restarts; that tier is bounded by
+    ``disk_max_bytes`` and pruned oldest-first.
+
+    Values are stored JSON-encoded, so every ``get`` returns a fresh copy the
+    caller is free to mutate.
+    """
+
+    def __init__(self, max_bytes=16 * 1024 * 1024, ttl_seconds=24 * 3600,
+                 disk_dir=None, disk_max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.ttl = ttl_seconds
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()  # key -> (expires_at, encoded)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._disk_writes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if self.disk_dir is not None:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, encoded = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return json.loads(encoded)
+                self._drop(key)
+        encoded = self._disk_get(key, now)
+        if encoded is not None:
+            with self._lock:
+                self.disk_hits += 1
+                self._put(key, encoded, now)
+            return json.loads(encoded)
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value):
+        encoded = json.dumps(value, separators=(",", ":"))
+        with self._lock:
+            self._put(key, encoded, time.time())
+        self._disk_set(key, encoded)
+
+    def _put(self, key, encoded, now):
+        size = len(encoded)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (now + self.ttl, encoded)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+
+    def _drop(self, key):
+        _, encoded = self._entries.pop(key)
+        self._bytes -= len(encoded)
+
+    # --- disk tier -------------------------------------------------------
+
+    def _disk_path(self, key):
+        return self.disk_dir / key[:2] / f"{key}.json"
+
+    def _disk_get(self, key, now):
+        if self.disk_dir is None:
+            return None
+        path = self._disk_path(key)
+        try:
+            if path.stat().st_mtime + self.ttl <= now:
+                path.unlink(missing_ok=True)
+                return None
+            return path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning(f"Prediction cache disk read failed for {path}: {e}")
+            return None
+
+    def _disk_set(self, key, encoded):
+        if self.disk_dir is None:
+            return
+        path = self._disk_path(key)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            path.parent.mkdir(exist_ok=True)
+            tmp.write_text(encoded, encoding="utf-8")
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"Prediction cache disk write failed for {path}: {e}")
+            tmp.unlink(missing_ok=True)
+            return
+        self._disk_writes += 1
+        if self._disk_writes % 100 == 0:
+            self.prune_disk()
+
+    def prune_disk(self):
+        """Delete expired files, then the oldest ones until under disk_max_bytes."""
+        if self.disk_dir is None:
+            return
+        now = time.time()
+        files = []
+        total = 0
+        for path in self.disk_dir.glob("*/*.json"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            if st.st_mtime + self.ttl <= now:
+                path.unlink(missing_ok=True)
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+        files.sort()
+        for _, size, path in files:
+            if total <= self.disk_max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "disk_dir": str(self.disk_dir) if self.disk_dir else None,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
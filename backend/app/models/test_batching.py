@@ -0,0 +1,101 @@
+"""Check that one undecodable upload in a micro-batch fails only its own request.
+
+Runs without TensorFlow or a model file: the model backend is a stub that
+returns fixed probabilities.
+
+Usage (from backend/):
+  python -m app.models.test_batching
+"""
+import asyncio
+import io
+
+import numpy as np
+from PIL import Image
+
+from app.models.batching import MicroBatcher
+from app.models.prediction import CLASSES, DishPredictor, InvalidImageError
+
+
+class StubBackend:
+    name = "stub"
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def predict(self, batch):
+        self.batch_sizes.append(batch.shape[0])
+        probs = np.zeros((batch.shape[0], len(CLASSES)), dtype=np.float32)
+        probs[:, 0] = 1.0
+        return probs
+
+
+def stub_predictor():
+    predictor = DishPredictor.__new__(DishPredictor)
+    predictor.top_k = 3
+    predictor.min_confidence = 0.0
+    predictor.backend = StubBackend()
+    return predictor
+
+
+def jpeg_bytes():
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 48), (200, 120, 40)).save(buf, "JPEG")
+    return buf.getvalue()
+
+
+def test_bad_image_fails_only_its_caller():
+    predictor = stub_predictor()
+
+    async def process(items):
+        return predictor.predict_batch(items)
+
+    async def run():
+        batcher = MicroBatcher(process, max_batch_size=4, max_wait_ms=50)
+        batcher.start()
+        try:
+            return await asyncio.gather(
+                batcher.submit(jpeg_bytes()),
+                batcher.submit(b"not an image"),
+                batcher.submit(jpeg_bytes()),
+                return_exceptions=True,
+            )
+        finally:
+            await batcher.stop()
+
+    good1, bad, good2 = asyncio.run(run())
+    assert good1["dish"] == CLASSES[0] and good2["dish"] == CLASSES[0]
+    assert isinstance(bad, InvalidImageError), bad
+    # the bad upload was left out of the model call, the rest shared one batch
+    assert predictor.backend.batch_sizes == [2], predictor.backend.batch_sizes
+
+
+def test_all_bad_skips_model():
+    predictor = stub_predictor()
+    results = predictor.predict_batch([b"", b"garbage"])
+    assert all(isinstance(r, InvalidImageError) for r in results)
+    assert predictor.backend.batch_sizes == []
+
+
+def test_stop_fails_pending_callers():
+    async def slow(items):
+        await asyncio.sleep(10)
+        return items
+
+    async def run():
+        # one batch in flight, one being collected, one still queued
+        batcher = MicroBatcher(slow, max_batch_size=2, max_wait_ms=1000, max_concurrent_batches=2)
+        batcher.start()
+        calls = [asyncio.ensure_future(batcher.submit(i)) for i in range(5)]
+        await asyncio.sleep(0.05)
+        await batcher.stop()
+        return await asyncio.wait_for(asyncio.gather(*calls, return_exceptions=True), 1)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results), results
+
+
+if __name__ == '__main__':
+    test_bad_image_fails_only_its_caller()
+    test_all_bad_skips_model()
+    test_stop_fails_pending_callers()
+    print("OK")
@@ -0,0 +1,89 @@
+"""Unit checks for the nutrient table helpers.
+
+Runs without the spreadsheet or pandas: tables are built in memory.
+
+Usage (from backend/):
+  python -m app.models.test_nutrients
+"""
+from app.models import nutrients
+from app.models.nutrients import NutrientIndex, normalize_nutrients
+
+
+def sample_index():
+    rows = {
+        "biryani_chicken": {"Dish": "Biryani (Chicken)", "Calories": 290},
+        "chicken_qorma": {"Dish": "Chicken Qorma", "Calories": 240},
+        "aloo_gosht": {"Dish": "Aloo Gosht", "Calories": 180},
+        "gol_gappy": {"Dish": "Gol Gappy", "Calories": 60},
+    }
+    return NutrientIndex(rows), rows
+
+
+def test_lookup_resolution_order():
+    index, rows = sample_index()
+    # exact key, with and without the parenthetical descriptor
+    assert index.lookup("Biryani (Chicken)") is rows["biryani_chicken"]
+    assert index.lookup("Gol Gappy (plate)") is rows["gol_gappy"]
+    # token spelling variants on both sides
+    assert index.lookup("Aaloo Ghost") is rows["aloo_gosht"]
+    assert index.lookup("Chicken Korma") is rows["chicken_qorma"]
+    # whole-name synonyms for model class names
+    assert index.lookup("biryani") is rows["biryani_chicken"]
+    assert index.lookup("Pani Puri") is rows["gol_gappy"]
+    # fuzzy match on a misspelling, nothing for an unrelated dish
+    assert index.lookup("chiken qorma") is rows["chicken_qorma"]
+    assert index.lookup("pizza") is None
+    assert index.lookup("") is None
+
+
+def test_lookup_is_memoized():
+    index, _ = sample_index()
+    index.lookup("pizza")
+    index.lookup("pizza")
+    info = index.lookup.cache_info()
+    assert (info.hits, info.misses) == (1, 1), info
+
+
+def test_normalize_nutrients():
+    raw = {
+        "Calories (kcal)": "1,250",
+        "Saturated Fat (g)": 9,
+        "Fat (g)": 30,
+        "fats": 99,
+        "Protein": float("nan"),
+        "carbs": "n/a",
+    }
+    assert normalize_nutrients(raw) == {"calories": 1250.0, "protein": 0.0, "carbs": 0.0, "fats": 30.0}
+    assert normalize_nutrients({"calories": True, "protein": None}) == dict.fromkeys(
+        ("calories", "protein", "carbs", "fats"), 0.0)
+    assert normalize_nutrients("not a dict")["calories"] == 0.0
+
+
+def test_normalize_drops_non_finite():
+    # json.loads accepts Infinity/NaN, and 1e999 overflows to inf
+    raw = {"calories": float("inf"), "protein": "-Infinity", "carbs": "1e999", "fats": 4}
+    assert normalize_nutrients(raw) == {"calories": 0.0, "protein": 0.0, "carbs": 0.0, "fats": 4.0}
+
+
+def test_reload_keeps_table_when_file_missing():
+    index, _ = sample_index()
+    index.generation = 3
+    index.source_stamp = ("nutrients.xlsx", 1024, 1700000000.0)
+    saved = nutrients._current, nutrients._generation, nutrients._find_nutrients_file
+    nutrients._current, nutrients._generation = index, 3
+    nutrients._find_nutrients_file = lambda: None
+    try:
+        assert nutrients.reload_table() is False
+        assert nutrients.reload_table(force=True) is False
+        assert nutrients._current is index and nutrients._generation == 3
+    finally:
+        nutrients._current, nutrients._generation, nutrients._find_nutrients_file = saved
+
+
+if __name__ == '__main__':
+    test_lookup_resolution_order()
+    test_lookup_is_memoized()
+    test_normalize_nutrients()
+    test_normalize_drops_non_finite()
+    test_reload_keeps_table_when_file_missing()
+    print("OK")
@@ -0,0 +1,62 @@
+"""Unit checks for portion-aware nutrient totals.
+
+Runs without the spreadsheet or pandas: the table is built in memory.
+
+Usage (from backend/):
+  python -m app.models.test_nutrition_engine
+"""
+from app.models.nutrients import NutrientIndex
+from app.models.nutrition_engine import NutritionEngine
+
+
+def sample_engine():
+    biryani = {"Dish": "Biryani (Chicken)", "Serving": "Per person (~200g)",
+               "Calories (kcal)": 400, "Protein (g)": 20, "Carbs (g)": 50, "Fat (g)": 12}
+    tea = {"Dish": "Tea", "Calories": 60, "Protein": 2, "Carbs": 8, "Fats": 2}
+    return NutritionEngine(NutrientIndex({"biryani_chicken": biryani, "tea": tea}))
+
+
+def test_portions_and_totals():
+    engine = sample_engine()
+    totals, items = engine.meal_totals([
+        {"dish": "biryani", "quantity": 1.5},
+        {"dish": "Biryani (Chicken)", "quantity": 100, "unit": "g"},
+        {"dish": "tea", "quantity": 2, "unit": "servings"},
+        {"dish": "pizza"},
+    ])
+    # 1.5 + 0.5 servings of biryani, 2 of tea (100g basis when Serving is absent)
+    assert totals == {"calories": 920.0, "protein": 44.0, "carbs": 116.0, "fats": 28.0}, totals
+    assert [i["matched"] for i in items] == [True, True, True, False]
+    assert items[1]["servings"] == 0.5 and items[1]["nutrients"]["calories"] == 200.0
+    assert "nutrients" not in items[3]
+
+
+def test_many_meals_at_once():
+    engine = sample_engine()
+    totals, _ = engine.compute([[{"dish": "tea"}], [], [{"dish": "tea", "quantity": 0.5, "unit": "kg"}]])
+    assert [engine.as_dict(t)["calories"] for t in totals] == [60.0, 0.0, 300.0]
+
+
+def test_invalid_items_raise_value_error():
+    engine = sample_engine()
+    bad = [
+        "biryani",
+        {"dish": "tea", "unit": "cup"},
+        {"dish": "tea", "quantity": -1},
+        {"dish": "tea", "quantity": "lots"},
+        {"dish": "tea", "quantity": float("nan")},
+        {"dish": "tea", "quantity": float("inf")},
+    ]
+    for item in bad:
+        try:
+            engine.meal_totals([item])
+        except ValueError:
+            continue
+        raise AssertionError(f"accepted {item!r}")
+
+
+if __name__ == '__main__':
+    test_portions_and_totals()
+    test_many_meals_at_once()
+    test_invalid_items_raise_value_error()
+    print("OK")
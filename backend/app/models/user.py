@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import Any, Dict, Optional
 
 class UserBase(BaseModel):
     username: Optional[str] = None
@@ -18,6 +18,8 @@ class UserProfile(UserBase):
     height: Optional[int] = None
     weight: Optional[int] = None
     profile_image_url: Optional[str] = None
+    # URLs per size from the image store, when the image was uploaded
+    profile_images: Optional[Dict[str, Any]] = None
     target_calories: Optional[int] = None
     target_protein: Optional[float] = None
     target_carbs: Optional[float] = None
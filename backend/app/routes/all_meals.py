@@ -1,15 +1,29 @@
-from fastapi import APIRouter, Depends, Query
-from app.utils.db import get_db
-from pymongo.database import Database
+from fastapi import APIRouter, Depends, Query, Request
+from app.utils.db import get_motor_db
+from app.utils.image_store import image_urls
+from app.utils.pagination import etag_response, fetch_meal_page
+from motor.motor_asyncio import AsyncIOMotorDatabase
 
 router = APIRouter()
 
 @router.get("/all-meals")
-def all_meals(email: str = Query(...), db: Database = Depends(get_db)):
-    meals = list(db.meals.find({"email": email}))
+async def all_meals(
+    request: Request,
+    email: str = Query(...),
+    limit: int = Query(None, ge=1),
+    cursor: str = Query(None),
+    date_from: str = Query(None),
+    date_to: str = Query(None),
+    fields: str = Query(None),
+    db: AsyncIOMotorDatabase = Depends(get_motor_db),
+):
+    # Newest first, one page at a time; pass next_cursor back as ?cursor= for the next page
+    meals, next_cursor = await fetch_meal_page(db, email, limit, cursor, date_from, date_to, fields)
     # Convert ObjectId and datetime to string for frontend
     for m in meals:
         m["_id"] = str(m["_id"])
         if "timestamp" in m:
             m["timestamp"] = str(m["timestamp"])
-    return {"meals": meals}
+        if m.get("image_key"):
+            m["images"] = image_urls(m["image_key"])
+    return etag_response(request, {"meals": meals, "next_cursor": next_cursor})
@@ -1,8 +1,8 @@
 from fastapi import APIRouter, HTTPException, status, Depends
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, EmailStr
-from motor.motor_asyncio import AsyncIOMotorClient
-from passlib.context import CryptContext
+from app.utils.db import get_motor_db
+from app.utils import passwords
 from datetime import datetime, timedelta
 from jose import jwt, JWTError
 import os
@@ -11,15 +11,6 @@ load_dotenv()
 
 router = APIRouter()
 
-# MongoDB setup
-MONGO_URL = os.getenv('MONGO_URL', 'mongodb://localhost:27017')
-client = AsyncIOMotorClient(MONGO_URL)
-db = client.nutripk
-users_collection = db.users
-
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # JWT setup
 SECRET_KEY = os.getenv('JWT_SECRET', 'nutripksecret')
 ALGORITHM = 'HS256'
@@ -44,13 +35,13 @@ class TokenResponse(BaseModel):
 
 
 async def get_user_by_email(email: str):
-    return await users_collection.find_one({"email": email})
+    return await get_motor_db().users.find_one({"email": email})
 
 @router.post('/signup', response_model=TokenResponse)
 async def signup(user: UserSignup):
     if await get_user_by_email(user.email):
         raise HTTPException(status_code=400, detail="Email already registered.")
-    hashed_pw = pwd_context.hash(user.password)
+    hashed_pw = await passwords.hash_password(user.password)
     user_doc = {
         "name": user.name,
         "email": user.email,
@@ -59,14 +50,14 @@ async def signup(user: UserSignup):
         "created_at": datetime.utcnow(),
         "phone": user.phone
     }
-    await users_collection.insert_one(user_doc)
+    await get_motor_db().users.insert_one(user_doc)
     token = jwt.encode({"sub": user.email, "exp": datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)}, SECRET_KEY, algorithm=ALGORITHM)
     return TokenResponse(status="success", message="User registered.", token=token)
 
 @router.post('/login', response_model=TokenResponse)
 async def login(user: UserLogin):
     db_user = await get_user_by_email(user.email)
-    if not db_user or not pwd_context.verify(user.password, db_user['password']):
+    if not db_user or not await passwords.verify_and_upgrade(user.password, db_user, get_motor_db().users):
         raise HTTPException(status_code=401, detail="Invalid credentials.")
     token = jwt.encode({"sub": user.email, "exp": datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)}, SECRET_KEY, algorithm=ALGORITHM)
     return TokenResponse(status="success", message="Login successful.", token=token)
\ No newline at end of file
@@ -1,20 +1,31 @@
 from fastapi import APIRouter, Depends, Query, HTTPException
-from app.utils.db import get_db
-from pymongo.database import Database
+from app.utils.db import get_motor_db
+from motor.motor_asyncio import AsyncIOMotorDatabase
 from bson import ObjectId
+from app.utils.rollups import try_apply_meal, write_guard
 
 router = APIRouter()
 
 @router.delete("/delete-meal")
-def delete_meal(meal_id: str = Query(...), db: Database = Depends(get_db)):
-    # Try to delete by ObjectId
+async def delete_meal(meal_id: str = Query(...), db: AsyncIOMotorDatabase = Depends(get_motor_db)):
     try:
-        result = db.meals.delete_one({"_id": ObjectId(meal_id)})
-        if result.deleted_count == 0:
-            # Try to delete by string _id (if not ObjectId)
-            result = db.meals.delete_one({"_id": meal_id})
-        if result.deleted_count == 0:
+        # Match the ObjectId first, then a legacy string _id
+        meal = await db.meals.find_one({"_id": ObjectId(meal_id)}, {"email": 1})
+        if meal is None:
+            meal = await db.meals.find_one({"_id": meal_id}, {"email": 1})
+        if meal is None:
             raise HTTPException(status_code=404, detail="Meal not found")
-        return {"status": "success", "deleted": True}
+        # find_one_and_delete returns the meal so its day's rollup can be decremented
+        fields = {"email": 1, "timestamp": 1, "nutrition": 1, "nutrients": 1}
+        async with write_guard(db, meal.get("email")) as update_rollup:
+            meal = await db.meals.find_one_and_delete({"_id": meal["_id"]}, projection=fields)
+        if meal is None:
+            raise HTTPException(status_code=404, detail="Meal not found")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    if update_rollup:
+        # logged, not raised: the meal is gone whether or not its rollup updates
+        await try_apply_meal(db, meal, -1)
+    return {"status": "success", "deleted": True}
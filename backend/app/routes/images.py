@@ -0,0 +1,40 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response
+
+from app.utils.http_cache import IMMUTABLE_CACHE_CONTROL, etag_matches
+from app.utils.image_store import (
+    DERIVATIVE_FORMATS, DERIVATIVE_SIZES, DERIVATIVE_VERSION, ensure_derivative, is_key, original_path,
+)
+
+router = APIRouter()
+
+
+@router.get("/{key}/{variant}")
+async def get_image(key: str, variant: str, request: Request):
+    """Serve a stored image: ``original.jpg`` or ``<size>.<fmt>`` (e.g. ``thumb.webp``).
+    Derivatives are generated on the first request and served from disk afterwards.
+
+    The key is the content hash, so responses are immutable: a year-long
+    Cache-Control, a strong ETag answered with 304, and FileResponse for Range
+    requests and zero-copy sends where the server supports them."""
+    if not is_key(key):
+        raise HTTPException(status_code=404, detail="Image not found")
+    name, _, fmt = variant.partition(".")
+    etag = f'"{key[:32]}-{name}.{fmt}' + (f'-v{DERIVATIVE_VERSION}"' if name != "original" else '"')
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    if name == "original" and fmt == "jpg":
+        path, media_type = original_path(key), "image/jpeg"
+        if not path.exists():
+            raise HTTPException(status_code=404, detail="Image not found")
+    elif name in DERIVATIVE_SIZES and fmt in DERIVATIVE_FORMATS:
+        media_type = DERIVATIVE_FORMATS[fmt][1]
+        try:
+            path = await run_in_threadpool(ensure_derivative, key, name, fmt)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Image not found")
+    else:
+        raise HTTPException(status_code=404, detail="Unknown image variant")
+    return FileResponse(path, media_type=media_type, headers=headers)
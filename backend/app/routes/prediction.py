@@ -1,38 +1,179 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException
+from pydantic import BaseModel
+from typing import List
 from pathlib import Path
-import shutil
+import asyncio
+import logging
 import os
-from tempfile import NamedTemporaryFile
-from ..models.prediction import DishPredictor
+import time
+from ..models.batching import MicroBatcher
+from ..models.inference_pool import InferenceExecutor
+from ..models.prediction_cache import PredictionCache, cache_key
+from ..models.nutrition_engine import get_engine
+from ..models.prediction import (
+    PREDICT_BACKEND, PREDICT_TOP_K, PREDICT_MIN_CONFIDENCE, InvalidImageError, model_path_for, model_version,
+)
 
 # Try to import nutrients helper (optional). If not present or fails, we'll skip enrichment.
 try:
-    from ..models.nutrients import get_nutrients_for
+    from ..models.nutrients import get_nutrients_versioned, preload_table, stop_reloader
 except Exception:
-    get_nutrients_for = None
+    get_nutrients_versioned = None
+    preload_table = None
+    stop_reloader = None
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
-predictor = None
+executor = None
+batcher = None
+cache = None
+cache_version = None
+_load_task = None
+
+# Model loading runs in the background after startup so the API (and workers
+# that never serve predictions) come up immediately; /readyz reports progress.
+model_status = {
+    "state": "starting",  # starting -> loading -> ready | failed
+    "error": None,
+    "backend": None,
+    "mode": None,
+    "load_seconds": None,
+    "workers": [],
+}
+
+# Micro-batching: concurrent requests are grouped into one model call.
+# Flush when PREDICT_MAX_BATCH_SIZE requests are queued or PREDICT_MAX_WAIT_MS
+# milliseconds after the first one arrived.
+PREDICT_MAX_BATCH_SIZE = int(os.getenv("PREDICT_MAX_BATCH_SIZE", "8"))
+PREDICT_MAX_WAIT_MS = float(os.getenv("PREDICT_MAX_WAIT_MS", "5"))
+
+# Inference runs off the event loop. INFERENCE_MODE is "thread" (one shared
+# model) or "process" (one model replica per worker process).
+INFERENCE_MODE = os.getenv("INFERENCE_MODE", "thread")
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))
+INFERENCE_INTRA_OP_THREADS = int(os.getenv("INFERENCE_INTRA_OP_THREADS", "0"))
+INFERENCE_INTER_OP_THREADS = int(os.getenv("INFERENCE_INTER_OP_THREADS", "0"))
+
+# Batch sizes to run through the model once at load time. Defaults to every
+# size the batcher can produce, so no request pays for tracing a new shape.
+PREDICT_WARMUP_BATCH_SIZES = [
+    int(b) for b in os.getenv(
+        "PREDICT_WARMUP_BATCH_SIZES",
+        ",".join(str(i) for i in range(1, PREDICT_MAX_BATCH_SIZE + 1)),
+    ).split(",") if b.strip()
+]
+
+# Prediction cache keyed by image content hash + model version. Set
+# PREDICT_CACHE_MAX_BYTES=0 to disable; PREDICT_CACHE_DIR enables the on-disk tier.
+PREDICT_CACHE_MAX_BYTES = int(os.getenv("PREDICT_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+PREDICT_CACHE_TTL_SECONDS = int(os.getenv("PREDICT_CACHE_TTL_SECONDS", str(24 * 3600)))
+PREDICT_CACHE_DIR = os.getenv("PREDICT_CACHE_DIR", "")
+PREDICT_CACHE_DISK_MAX_BYTES = int(os.getenv("PREDICT_CACHE_DISK_MAX_BYTES", str(256 * 1024 * 1024)))
+
+
+def _log_preload_error(fut):
+    if not fut.cancelled() and fut.exception() is not None:
+        logger.error("Nutrient table preload failed", exc_info=fut.exception())
 
-@router.on_event("startup")
-async def startup_event():
-    global predictor
+
+async def _load_model():
+    """Load and warm the model (and nutrient table) off the event loop, then start batching."""
+    global executor, batcher, cache, cache_version
+    loop = asyncio.get_running_loop()
+    model_status["state"] = "loading"
+    model_status["backend"] = PREDICT_BACKEND
+    model_status["mode"] = INFERENCE_MODE
+    start = time.perf_counter()
+    if preload_table is not None:
+        # runs alongside the model load; a failure is logged, lookups retry on first use
+        loop.run_in_executor(None, preload_table).add_done_callback(_log_preload_error)
     try:
-        predictor = DishPredictor()
+        new_executor = InferenceExecutor(
+            mode=INFERENCE_MODE,
+            workers=INFERENCE_WORKERS,
+            intra_op_threads=INFERENCE_INTRA_OP_THREADS,
+            inter_op_threads=INFERENCE_INTER_OP_THREADS,
+            warmup_batch_sizes=PREDICT_WARMUP_BATCH_SIZES,
+        )
+        await loop.run_in_executor(None, new_executor.start)
+        if PREDICT_CACHE_MAX_BYTES > 0:
+            version = await loop.run_in_executor(None, model_version, model_path_for())
+            # top-k settings change the response, so they are part of the version
+            cache_version = f"{PREDICT_BACKEND}:{version}:k{PREDICT_TOP_K}:min{PREDICT_MIN_CONFIDENCE}"
+            cache = PredictionCache(
+                max_bytes=PREDICT_CACHE_MAX_BYTES,
+                ttl_seconds=PREDICT_CACHE_TTL_SECONDS,
+                disk_dir=PREDICT_CACHE_DIR or None,
+                disk_max_bytes=PREDICT_CACHE_DISK_MAX_BYTES,
+            )
     except Exception as e:
-        print(f"Error loading model: {e}")
+        # Keep serving the rest of the API, but stay out of rotation: /readyz
+        # returns 503 with the error until the worker is restarted.
+        logger.exception("Error loading model")
+        model_status["state"] = "failed"
+        model_status["error"] = f"{type(e).__name__}: {e}"
+        return
+    executor = new_executor
+    batcher = MicroBatcher(
+        executor.predict_batch,
+        max_batch_size=PREDICT_MAX_BATCH_SIZE,
+        max_wait_ms=PREDICT_MAX_WAIT_MS,
+        max_concurrent_batches=INFERENCE_WORKERS,
+    )
+    batcher.start()
+    model_status["workers"] = executor.worker_info
+    model_status["load_seconds"] = round(time.perf_counter() - start, 3)
+    model_status["state"] = "ready"
+    print(f"Model ready in {model_status['load_seconds']}s")
+
+
+def is_ready():
+    return model_status["state"] == "ready"
+
+
+async def startup():
+    """Start loading the model in the background (called from the app lifespan)."""
+    global _load_task
+    _load_task = asyncio.get_running_loop().create_task(_load_model())
+
+
+async def shutdown():
+    """Stop the batcher, then the inference executor (called from the app lifespan)."""
+    if _load_task is not None and not _load_task.done():
+        _load_task.cancel()
+    if batcher is not None:
+        await batcher.stop()
+    if executor is not None:
+        executor.shutdown()
+    if stop_reloader is not None:
+        stop_reloader()
+
+
+@router.get("/predict/stats")
+async def predict_stats():
+    """Queue depth and batch size histograms for the prediction batcher"""
+    if batcher is None:
+        raise HTTPException(status_code=503, detail=f"Model not ready ({model_status['state']})")
+    stats = batcher.stats()
+    stats["cache"] = cache.stats() if cache is not None else None
+    return stats
+
+async def _cache_call(fn, *args):
+    """Run a cache operation; with the disk tier enabled it reads, writes and
+    prunes files, so it runs in the default executor instead of on the loop."""
+    if cache.disk_dir is None:
+        return fn(*args)
+    return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
 
 @router.post("/predict/")
 async def predict_dish(file: UploadFile = File(..., description="Image file to predict")):
     """
     Upload an image and get dish predictions
     """
-    # Debug information
-    print("Request received for prediction")
-    print(f"File details:")
-    print(f"- Filename: {file.filename}")
-    print(f"- Content type: {file.content_type}")
-    print(f"- Size: {file.size if hasattr(file, 'size') else 'unknown'}")
+    logger.debug("Prediction request: filename=%s content_type=%s size=%s",
+                 file.filename, file.content_type, getattr(file, "size", None))
 
     # Validate file
     if not file:
@@ -49,36 +190,63 @@ async def predict_dish(file: UploadFile = File(..., description="Image file to p
             status_code=400,
             detail=f"File must be an image. Received content-type: {file.content_type}"
         )
-    
+
+    if batcher is None:
+        raise HTTPException(status_code=503, detail=f"Model not ready ({model_status['state']})")
+
     try:
-        print("Creating temporary file...")
-        # Create a temporary file to store the uploaded image
-        with NamedTemporaryFile(delete=False) as temp_file:
-            shutil.copyfileobj(file.file, temp_file)
-            temp_path = temp_file.name
-        
-        print(f"Temporary file created at: {temp_path}")
-        print("Making prediction...")
-        # Make prediction
-        result = predictor.predict(temp_path)
+        # Decode straight from the uploaded bytes (no temporary file)
+        contents = await file.read()
+        if not contents:
+            raise HTTPException(status_code=400, detail="Empty file")
+        key = cache_key(contents, cache_version) if cache is not None else None
+        result = await _cache_call(cache.get, key) if key is not None else None
+        if result is not None:
+            logger.debug("Serving prediction from cache")
+            result["cached"] = True
+        else:
+            logger.debug("Making prediction")
+            # Make prediction (queued and batched with concurrent requests)
+            result = await batcher.submit(contents)
+            if key is not None:
+                await _cache_call(cache.set, key, result)
+            result["cached"] = False
 
         # Enrich with nutrients if helper available
         try:
-            if get_nutrients_for is not None and 'dish' in result:
-                nutrients = get_nutrients_for(result.get('dish'))
+            if get_nutrients_versioned is not None and 'dish' in result:
+                nutrients, generation = get_nutrients_versioned(result.get('dish'))
                 if nutrients:
                     result['nutrients'] = nutrients
+                    # which nutrient table build these values came from
+                    result['nutrients_generation'] = generation
         except Exception as exc:
             # Don't fail prediction if nutrient enrichment fails
-            print(f"Warning: failed to attach nutrients: {exc}")
-
-        # Clean up the temporary file
-        print("Cleaning up temporary file...")
-        os.unlink(temp_path)
+            logger.warning("Failed to attach nutrients: %s", exc)
 
         return result
+    except HTTPException:
+        raise
+    except InvalidImageError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        print(f"Error during prediction: {str(e)}")
-        if 'temp_path' in locals() and os.path.exists(temp_path):
-            os.unlink(temp_path)
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        logger.exception("Error during prediction")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+class MealItem(BaseModel):
+    dish: str
+    quantity: float = 1
+    unit: str = "serving"
+
+
+@router.post("/nutrients")
+async def meal_nutrients(items: List[MealItem]):
+    """
+    Compute total nutrients for a meal with several dishes and portion sizes
+    """
+    try:
+        totals, resolved = get_engine().meal_totals([i.dict() for i in items])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"totals": totals, "items": resolved}
@@ -1,15 +1,30 @@
-from fastapi import APIRouter, Depends, File, UploadFile, Form
+from fastapi import APIRouter, Depends, File, UploadFile, Form, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from datetime import datetime, timezone
-from app.utils.db import get_db
-from pymongo.database import Database
-import os
+from app.utils.db import get_motor_db
+from motor.motor_asyncio import AsyncIOMotorDatabase
 import json
-import uuid
+import math
 from dateutil.parser import parse as parse_dt
+from app.models.nutrition_engine import get_engine
+from app.models.nutrients import normalize_nutrients
+from app.utils.rollups import try_apply_meal, write_guard
+from app.utils.image_store import image_urls, store_upload
 
 router = APIRouter()
 
 
+def _has_non_finite(value):
+    # NaN/Infinity (or 1e999) parse as floats but cannot be serialized back to JSON
+    if isinstance(value, float):
+        return not math.isfinite(value)
+    if isinstance(value, dict):
+        return any(_has_non_finite(v) for v in value.values())
+    if isinstance(value, list):
+        return any(_has_non_finite(v) for v in value)
+    return False
+
+
 @router.post("/save-meal")
 async def save_meal(
     name: str = Form(...),
@@ -17,19 +32,52 @@ async def save_meal(
     timestamp: str = Form(None),
     email: str = Form(...),
     image: UploadFile = File(None),
-    db: Database = Depends(get_db),
+    items: str = Form(None),
+    quantity: float = Form(None),
+    unit: str = Form(None),
+    db: AsyncIOMotorDatabase = Depends(get_motor_db),
 ):
     meal = {
         "name": name,
         "email": email,
     }
 
-    # parse nutrients if provided (JSON string)
-    if nutrients:
+    # Portion-aware meals: either a JSON list of items
+    # [{"dish": ..., "quantity": ..., "unit": "serving"|"g"|"kg"|"oz"}] or a
+    # quantity/unit for the dish in `name`. Nutrients are then computed
+    # server-side from the nutrient table instead of trusting the client.
+    portion_items = None
+    if items:
+        try:
+            portion_items = json.loads(items)
+            if not isinstance(portion_items, list):
+                raise ValueError("items must be a JSON list")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid items: {e}")
+    elif quantity is not None or unit:
+        portion_items = [{"dish": name, "quantity": quantity if quantity is not None else 1, "unit": unit}]
+
+    if portion_items is not None:
+        try:
+            # may (re)load the nutrient table on first use; keep it off the event loop
+            totals, resolved = await run_in_threadpool(
+                lambda: get_engine().meal_totals(portion_items)
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        meal["items"] = resolved
+        meal["nutrients"] = totals
+    # otherwise parse nutrients if provided (JSON string)
+    elif nutrients:
         try:
             meal["nutrients"] = json.loads(nutrients)
         except Exception:
             meal["nutrients"] = nutrients
+        if _has_non_finite(meal["nutrients"]):
+            raise HTTPException(status_code=400, detail="Invalid nutrients: values must be finite numbers")
+
+    # Typed copy of the macros in the canonical schema, read by aggregations
+    meal["nutrition"] = normalize_nutrients(meal.get("nutrients"))
 
     # parse timestamp (normalize to UTC naive datetime)
     if timestamp:
@@ -50,19 +98,19 @@ async def save_meal(
 
     # handle uploaded image: save to disk and set public static path
     if image:
-        ext = os.path.splitext(image.filename)[1] or ".jpg"
-        img_name = f"{uuid.uuid4().hex}{ext}"
-        folder = os.path.join("app", "models", "meal_images")
-        os.makedirs(folder, exist_ok=True)
-        img_path = os.path.join(folder, img_name)
-        with open(img_path, "wb") as f:
-            f.write(await image.read())
-        image_url = f"/static/meal_images/{img_name}"
-        meal["image"] = image_url
+        # streamed in chunks, size-capped (413) and stored once per content hash;
+        # `image` stays the full-size URL for existing clients
+        meal["image_key"] = await store_upload(image)
+        meal["image"] = image_urls(meal["image_key"])["original"]
     else:
         # No uploaded file - allow client to provide an image URL via form (not recommended)
         meal["image"] = None
 
-    result = db.meals.insert_one(meal)
+    async with write_guard(db, email) as update_rollup:
+        result = await db.meals.insert_one(meal)
+    if update_rollup:
+        await try_apply_meal(db, meal, 1)
     meal["_id"] = str(result.inserted_id)
+    if meal.get("image_key"):
+        meal["images"] = image_urls(meal["image_key"])
     return {"status": "success", "meal": meal}
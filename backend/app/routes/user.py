@@ -1,29 +1,25 @@
 from fastapi import APIRouter, HTTPException, status, Depends, Body, Request
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from app.models.user import UserCreate, UserLogin, UserProfile, UserUpdate, PasswordResetRequest, OTPVerify
-from app.utils.email_utils import send_reset_email
-from app.utils.email_utils import send_otp_email
+from app.utils.email_utils import reset_email, otp_email
+from app.utils import outbox
 from fastapi import UploadFile, File, Form
 import os
 
 from typing import Dict
-from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from fastapi import Request
-import motor.motor_asyncio
+from app.utils.db import get_motor_db
+from app.utils.pagination import etag_response, fetch_meal_page
+from app.utils import rollups
+from app.utils.image_store import image_urls, store_bytes, store_upload
+from app.utils.http_cache import versioned_static_url
+from app.utils import passwords
+from app.utils.user_cache import get_cached_user, invalidate as invalidate_cached_user, user_cache
 
 router = APIRouter()
 
-# MongoDB setup
-MONGO_DETAILS = "mongodb://localhost:27017"
-client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_DETAILS)
-db = client.nutripk
-user_collection = db.get_collection("users")
-
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # JWT settings
 SECRET_KEY = "nutripk_secret_key"
 ALGORITHM = "HS256"
@@ -31,13 +27,19 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/user/token")
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+# Comma-separated emails allowed to read the operational /stats endpoints
+ADMIN_EMAILS = {e.strip().lower() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()}
 
-def get_password_hash(password: str):
+async def verify_password(plain_password, user: dict):
+    # bcrypt runs on the password worker pool; upgrades the stored hash if the work factor changed
+    return await passwords.verify_and_upgrade(plain_password, user, get_motor_db().users)
+
+async def get_password_hash(password: str):
     try:
         # bcrypt handles up to 72 bytes; long passwords are automatically hashed safely
-        return pwd_context.hash(password.encode('utf-8', errors='ignore'))
+        return await passwords.hash_password(password.encode('utf-8', errors='ignore'))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Password hashing failed: {str(e)}")
 
@@ -47,17 +49,30 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+def create_user_token(user: dict):
+    # claims get_current_user needs, so authenticated requests skip the user lookup
+    return create_access_token(data={
+        "sub": user["email"],
+        "uid": str(user["_id"]),
+        "username": user.get("username"),
+    })
+
 async def get_user_by_email(email: str):
-    user = await user_collection.find_one({"email": email})
+    user = await get_motor_db().users.find_one({"email": email})
     return user
 
-async def get_current_user(request: Request, token: str = Depends(oauth2_scheme)):
-    # Debug: log incoming Authorization header and token presence
-    try:
-        auth_hdr = request.headers.get('authorization')
-        print(f"get_current_user: Authorization header: {auth_hdr}")
-    except Exception:
-        auth_hdr = None
+def _with_image_urls(user: dict):
+    # per-size URLs for store images; cache-busting version on legacy /static ones
+    user["profile_images"] = image_urls(user.get("profile_image_key"))
+    user["profile_image_url"] = versioned_static_url(user.get("profile_image_url"))
+    return user
+
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    """The caller from the verified token claims: {"email", "_id", "username"}.
+
+    Tokens from create_user_token carry these claims, so no database read is
+    made. Older tokens with only ``sub`` fall back to the cached user lookup.
+    Handlers that need the full document should use get_cached_user()."""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -68,22 +83,21 @@ async def get_current_user(request: Request, token: str = Depends(oauth2_scheme)
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
-    except JWTError:
-        # Log the error to help debugging
-        import traceback
-        print('JWT decode failed:', traceback.format_exc())
+    except JWTError as e:
+        print(f"JWT decode failed: {e}")
         raise credentials_exception
-    user = await get_user_by_email(email)
+    if payload.get("uid"):
+        return {"email": email, "_id": payload["uid"], "username": payload.get("username")}
+    user = await get_cached_user(email)
     if user is None:
         raise credentials_exception
-    return user
+    return {"email": email, "_id": str(user["_id"]), "username": user.get("username")}
 
 
 @router.get("/water")
 async def get_water(email: str):
     # return water records for given email (all or by date query param optional)
-    client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_DETAILS)
-    db = client.nutripk
+    db = get_motor_db()
     docs = []
     async for d in db.water.find({"email": email}):
         # convert ObjectId to str if present
@@ -95,24 +109,27 @@ async def get_water(email: str):
 @router.post("/water")
 async def set_water(email: str = Form(...), date: str = Form(...), glasses: int = Form(...)):
     # upsert water record for date (date expected in YYYY-MM-DD)
-    client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_DETAILS)
-    db = client.nutripk
-    await db.water.update_one({"email": email, "date": date}, {"$set": {"glasses": int(glasses)}}, upsert=True)
+    db = get_motor_db()
+    async with rollups.write_guard(db, email) as update_rollup:
+        await db.water.update_one({"email": email, "date": date}, {"$set": {"glasses": int(glasses)}}, upsert=True)
+    if update_rollup:
+        await rollups.set_water(db, email, date, glasses)
     return {"status": "ok", "email": email, "date": date, "glasses": int(glasses)}
 
 
 @router.get("/meals")
-async def get_meals_for_date(email: str, date: str = None):
-    # date optional; if provided filter meals by day (PK timezone assumed by weekly_summary)
-    client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_DETAILS)
-    db = client.nutripk
-    query = {"email": email}
-    results = []
-    async for m in db.meals.find(query).sort([('timestamp', -1)]).limit(100):
+async def get_meals_for_date(request: Request, email: str, date: str = None, date_from: str = None,
+                             date_to: str = None, limit: int = 100, cursor: str = None, fields: str = None):
+    # date optional; if provided only that PK local day (YYYY-MM-DD) is returned
+    db = get_motor_db()
+    if date:
+        date_from = date_to = date
+    results, next_cursor = await fetch_meal_page(db, email, limit, cursor, date_from, date_to, fields)
+    for m in results:
         m['_id'] = str(m.get('_id'))
-        # include nutrients and image
-        results.append(m)
-    return {"meals": results}
+        if m.get('image_key'):
+            m['images'] = image_urls(m['image_key'])
+    return etag_response(request, {"meals": results, "next_cursor": next_cursor})
 
 
 @router.post("/signup", response_model=UserProfile)
@@ -120,7 +137,7 @@ async def signup(user: UserCreate):
     existing = await get_user_by_email(user.email)
     if existing:
         raise HTTPException(status_code=400, detail="Email already exists")
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash(user.password)
     user_dict = {
         "email": user.email,
         "username": user.username,
@@ -131,7 +148,7 @@ async def signup(user: UserCreate):
         "age": None,
         "profile_image_url": None,
     }
-    await user_collection.insert_one(user_dict)
+    await get_motor_db().users.insert_one(user_dict)
     user_dict.pop("password")
     return UserProfile(**user_dict)
 
@@ -142,9 +159,9 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     user = await get_user_by_email(form_data.username)
     if not user:
         raise HTTPException(status_code=404, detail="Account does not exist. Please sign up first.")
-    if not verify_password(form_data.password, user["password"]):
+    if not await verify_password(form_data.password, user):
         raise HTTPException(status_code=401, detail="Incorrect password.")
-    access_token = create_access_token(data={"sub": user["email"]})
+    access_token = create_user_token(user)
     return {"access_token": access_token, "token_type": "bearer"}
 
 
@@ -153,27 +170,28 @@ async def login(data: UserLogin):
     user = await get_user_by_email(data.email)
     if not user:
         raise HTTPException(status_code=404, detail="Account does not exist. Please sign up first.")
-    if not verify_password(data.password, user["password"]):
+    if not await verify_password(data.password, user):
         raise HTTPException(status_code=401, detail="Incorrect password.")
+    access_token = create_user_token(user)
     user.pop("password")
     # Ensure profile_image_url is present
     user.setdefault("profile_image_url", None)
-    access_token = create_access_token(data={"sub": user["email"]})
+    _with_image_urls(user)
     profile = UserProfile(**user)
     return {**profile.dict(), "access_token": access_token, "token_type": "bearer"}
 
 
 @router.get("/profile/{email}", response_model=UserProfile)
 async def get_profile(email: str, current_user: dict = Depends(get_current_user)):
-    user = await get_user_by_email(email)
+    user = await get_cached_user(email)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    user.pop("password")
     # Ensure all required fields are present
     user.setdefault("profile_image_url", None)
     user.setdefault("age", None)
     user.setdefault("height", None)
     user.setdefault("weight", None)
+    _with_image_urls(user)
     return UserProfile(**user)
 
 
@@ -251,20 +269,11 @@ async def update_profile(
 
     if is_upload:
         try:
-            filename = getattr(profile_image_file, 'filename', f'{email}.jpg')
-            ext = os.path.splitext(filename)[1] or '.jpg'
-            img_name = f"{email}{ext}"
-            # Build absolute path inside the app/models/profile_images directory so it's unambiguous
-            base_app_dir = os.path.dirname(os.path.dirname(__file__))  # backend/app
-            img_dir = os.path.join(base_app_dir, 'models', 'profile_images')
-            os.makedirs(img_dir, exist_ok=True)
-            img_path = os.path.join(img_dir, img_name)
-            contents = await profile_image_file.read()
-            with open(img_path, 'wb') as f:
-                f.write(contents)
-            image_url = f"/static/profile_images/{img_name}"
-            print(f"Saved profile image for {email} -> {img_path} (size={len(contents)} bytes)")
-            update_data['profile_image_url'] = image_url
+            # content-addressed store: a new photo gets a new URL, derivatives per size
+            key = await store_upload(profile_image_file)
+            print(f"Saved profile image for {email} -> {key}")
+            update_data['profile_image_key'] = key
+            update_data['profile_image_url'] = image_urls(key)['original']
         except Exception as e:
             print(f"Failed to save profile image for {email}: {e}")
             # don't raise; continue and allow other updates
@@ -281,23 +290,12 @@ async def update_profile(
             try:
                 # data:[mime];base64,[data]
                 header, b64data = profile_image_data.split(',', 1)
-                # infer extension
-                if 'image/png' in header:
-                    ext = '.png'
-                else:
-                    ext = '.jpg'
-                img_name = f"{email}{ext}"
-                base_app_dir = os.path.dirname(os.path.dirname(__file__))
-                img_dir = os.path.join(base_app_dir, 'models', 'profile_images')
-                os.makedirs(img_dir, exist_ok=True)
-                img_path = os.path.join(img_dir, img_name)
                 import base64
                 contents = base64.b64decode(b64data)
-                with open(img_path, 'wb') as f:
-                    f.write(contents)
-                image_url = f"/static/profile_images/{img_name}"
-                print(f"Saved profile image (base64) for {email} -> {img_path} (size={len(contents)} bytes)")
-                update_data['profile_image_url'] = image_url
+                key = await store_bytes(contents)
+                print(f"Saved profile image (base64) for {email} -> {key} (size={len(contents)} bytes)")
+                update_data['profile_image_key'] = key
+                update_data['profile_image_url'] = image_urls(key)['original']
             except Exception as e:
                 print(f"Failed to save profile image data for {email}: {e}")
                 # fallback to profile_image_url if provided
@@ -307,24 +305,28 @@ async def update_profile(
             # If a URL string was provided via form (or client didn't send UploadFile), use provided profile_image_url field
             if profile_image_url:
                 update_data["profile_image_url"] = profile_image_url
-    await user_collection.update_one({"email": email}, {"$set": update_data})
+                if profile_image_url != user.get("profile_image_url"):
+                    update_data["profile_image_key"] = None
+    await get_motor_db().users.update_one({"email": email}, {"$set": update_data})
+    invalidate_cached_user(email)
     # Re-fetch user to get updated data
-    updated_user = await get_user_by_email(email)
-    updated_user.pop("password")
+    updated_user = await get_cached_user(email)
+    _with_image_urls(updated_user)
     return UserProfile(**updated_user)
 
 
 
 @router.get("/profile-public")
 async def get_profile_public(email: str):
-    user = await get_user_by_email(email)
+    user = await get_cached_user(email)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     # return only public fields without requiring auth
     public = {
         "email": user.get("email"),
         "username": user.get("username"),
-        "profile_image_url": user.get("profile_image_url"),
+        "profile_image_url": versioned_static_url(user.get("profile_image_url")),
+        "profile_images": image_urls(user.get("profile_image_key")),
         "target_calories": user.get("target_calories", None),
         "target_protein": user.get("target_protein", None),
         "target_carbs": user.get("target_carbs", None),
@@ -342,8 +344,11 @@ async def forgot_password(req: PasswordResetRequest):
     # Generate password reset token (JWT, expires in 30 min)
     token = create_access_token({"sub": user["email"]}, expires_delta=timedelta(minutes=30))
     reset_link = f"http://localhost:3000/reset-password?token={token}"  # Change to your frontend URL
-    sent = send_reset_email(req.email, reset_link)
-    if not sent:
+    # queued for the background sender; the link expires with the token
+    try:
+        await outbox.enqueue(req.email, *reset_email(reset_link), kind="reset", expires_in=timedelta(minutes=30))
+    except Exception as e:
+        print(f"Failed to queue reset email for {req.email}: {e}")
         raise HTTPException(status_code=500, detail="Failed to send email. Please try again later.")
     return {"msg": "Password reset link sent to your email."}
 
@@ -358,9 +363,11 @@ async def send_otp(req: PasswordResetRequest):
     otp = f"{secrets.randbelow(1000000):06d}"
     expires = datetime.utcnow() + timedelta(minutes=10)
     # store OTP and expiry in user document
-    await user_collection.update_one({"email": req.email}, {"$set": {"otp_code": otp, "otp_expires": expires}})
-    sent = send_otp_email(req.email, otp)
-    if not sent:
+    await get_motor_db().users.update_one({"email": req.email}, {"$set": {"otp_code": otp, "otp_expires": expires}})
+    try:
+        await outbox.enqueue(req.email, *otp_email(otp), kind="otp", expires_in=timedelta(minutes=10))
+    except Exception as e:
+        print(f"Failed to queue OTP email for {req.email}: {e}")
         raise HTTPException(status_code=500, detail="Failed to send OTP. Please try again later.")
     return {"msg": "OTP sent to your email."}
 
@@ -388,7 +395,7 @@ async def verify_otp(otp_req: OTPVerify):
     if not expires_dt or datetime.utcnow() > expires_dt:
         raise HTTPException(status_code=400, detail="OTP expired.")
     # OTP valid -> remove otp fields and issue short lived token for reset (15 min)
-    await user_collection.update_one({"email": otp_req.email}, {"$unset": {"otp_code": "", "otp_expires": ""}})
+    await get_motor_db().users.update_one({"email": otp_req.email}, {"$unset": {"otp_code": "", "otp_expires": ""}})
     token = create_access_token({"sub": otp_req.email}, expires_delta=timedelta(minutes=15))
     return {"msg": "OTP verified.", "token": token}
 
@@ -408,6 +415,29 @@ async def reset_password(data: PasswordReset):
     user = await get_user_by_email(email)
     if not user:
         raise HTTPException(status_code=404, detail="User not found.")
-    hashed_password = get_password_hash(data.new_password)
-    await user_collection.update_one({"email": email}, {"$set": {"password": hashed_password}})
-    return {"msg": "Password has been reset successfully."}
\ No newline at end of file
+    hashed_password = await get_password_hash(data.new_password)
+    await get_motor_db().users.update_one({"email": email}, {"$set": {"password": hashed_password}})
+    return {"msg": "Password has been reset successfully."}
+
+
+async def require_admin(current_user: dict = Depends(get_current_user)):
+    """Authenticated caller whose email is listed in ADMIN_EMAILS; 403 otherwise."""
+    if current_user["email"].lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin access required.")
+    return current_user
+
+
+@router.get("/password-hash/stats", dependencies=[Depends(require_admin)])
+async def password_hash_stats():
+    """Queue and run times of the bcrypt worker pool."""
+    return passwords.stats()
+
+
+@router.get("/user-cache/stats", dependencies=[Depends(require_admin)])
+async def user_cache_stats():
+    return user_cache.stats()
+
+
+@router.get("/email-outbox/stats", dependencies=[Depends(require_admin)])
+async def email_outbox_stats():
+    return outbox.sender.stats()
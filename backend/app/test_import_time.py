@@ -0,0 +1,85 @@
+"""Cold-start import budget for the API.
+
+Imports ``app.main`` in a fresh interpreter with ``-X importtime`` and fails if
+the cumulative import time exceeds the budget, or if heavy modules that are
+meant to load lazily (TensorFlow, pandas) get imported at startup.
+
+Usage (from backend/):
+  python -m app.test_import_time                # default budget
+  python -m app.test_import_time --budget-ms 800
+  python -m pytest app/test_import_time.py
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "1500"))
+# Modules that must not be imported just by starting the API
+LAZY_MODULES = ("tensorflow", "keras", "pandas", "openpyxl", "onnxruntime")
+
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure_import(module="app.main"):
+    """Return (cumulative_ms, 10 slowest direct imports of module, loaded lazy modules)."""
+    code = (
+        f"import sys, {module}; "
+        f"print('lazy:' + ','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+    total_us = None
+    children = []
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if not m:
+            continue
+        self_us, cumulative_us, indent, name = m.groups()
+        if name == module:
+            total_us = int(cumulative_us)
+        if len(indent) == 3:  # imported directly by the module under test
+            children.append((int(cumulative_us) / 1000.0, name))
+    if total_us is None:
+        raise RuntimeError(f"No importtime entry for {module}")
+    # the module may print at import time; our answer is the "lazy:" line
+    lazy_line = [l for l in proc.stdout.splitlines() if l.startswith("lazy:")][-1]
+    loaded_lazy = [m for m in lazy_line[len("lazy:"):].split(",") if m]
+    children.sort(reverse=True)
+    return total_us / 1000.0, children[:10], loaded_lazy
+
+
+def test_import_time_budget(budget_ms=IMPORT_TIME_BUDGET_MS):
+    total_ms, slowest, loaded_lazy = measure_import()
+    assert not loaded_lazy, f"Imported at startup but should be lazy: {', '.join(loaded_lazy)}"
+    assert total_ms <= budget_ms, (
+        f"import app.main took {total_ms:.0f}ms (budget {budget_ms:.0f}ms); slowest: "
+        + ", ".join(f"{name} {ms:.0f}ms" for ms, name in slowest)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fail if API cold-start import time regresses')
+    parser.add_argument('--budget-ms', type=float, default=IMPORT_TIME_BUDGET_MS)
+    args = parser.parse_args()
+
+    total_ms, slowest, loaded_lazy = measure_import()
+    print(f"import app.main: {total_ms:.0f}ms (budget {args.budget_ms:.0f}ms)")
+    print("Slowest imports:")
+    for ms, name in slowest:
+        print(f"  {ms:8.1f}ms  {name}")
+    try:
+        test_import_time_budget(args.budget_ms)
+    except AssertionError as e:
+        print(f"FAIL: {e}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
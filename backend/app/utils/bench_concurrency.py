@@ -0,0 +1,156 @@
+"""Concurrency benchmark for the meal routes: blocking pymongo vs Motor.
+
+Runs a mix of /all-meals, /weekly-summary and /save-meal (with a small image)
+requests concurrently against the app in-process and reports throughput,
+p99 latency and the worst event-loop stall seen by a ticker task. The
+"blocking" mode mounts the previous handlers: sync pymongo for reads (each
+request holds a threadpool slot) and a save-meal that calls insert_one and
+writes the image on the event loop.
+
+Usage (from backend/, needs a local mongod):
+  python -m app.utils.bench_concurrency --requests 1500 --concurrency 100
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import time
+import uuid
+
+import httpx
+from fastapi import APIRouter, Depends, FastAPI, File, Form, Query, UploadFile
+from pymongo.database import Database
+
+from app.routes import all_meals, save_meal, weekly_summary
+from app.utils import db as db_module
+from app.utils.bench_weekly_summary import legacy_weekly_summary
+from app.utils.image_store import original_path
+
+EMAIL = "concurrency@nutripk.local"
+
+
+def _sample_jpeg():
+    from PIL import Image
+    buf = io.BytesIO()
+    Image.frombytes("RGB", (256, 256), os.urandom(256 * 256 * 3)).save(buf, "JPEG", quality=90)
+    return buf.getvalue()
+
+
+IMAGE = _sample_jpeg()
+
+
+def blocking_router():
+    """The handlers as they were before the move to Motor, kept for comparison."""
+    router = APIRouter()
+
+    @router.get("/all-meals")
+    def legacy_all_meals(email: str = Query(...), db: Database = Depends(db_module.get_db)):
+        meals = list(db.meals.find({"email": email}))
+        for m in meals:
+            m["_id"] = str(m["_id"])
+            if "timestamp" in m:
+                m["timestamp"] = str(m["timestamp"])
+        return {"meals": meals}
+
+    @router.get("/weekly-summary")
+    def legacy_summary(email: str = Query(...), db: Database = Depends(db_module.get_db)):
+        return {"summary": legacy_weekly_summary(db, email)}
+
+    @router.post("/save-meal")
+    async def legacy_save_meal(name: str = Form(...), email: str = Form(...), nutrients: str = Form(None),
+                               image: UploadFile = File(None), db: Database = Depends(db_module.get_db)):
+        meal = {"name": name, "email": email, "nutrients": json.loads(nutrients or "{}")}
+        if image:
+            img_path = os.path.join("app", "models", "meal_images", f"{uuid.uuid4().hex}.jpg")
+            with open(img_path, "wb") as f:
+                f.write(await image.read())
+            meal["image"] = img_path
+        result = db.meals.insert_one(meal)
+        return {"status": "success", "id": str(result.inserted_id)}
+
+    return router
+
+
+def build_app(mode):
+    app = FastAPI()
+    if mode == "blocking":
+        app.include_router(blocking_router(), prefix="/api/user")
+    else:
+        for module in (all_meals, weekly_summary, save_meal):
+            app.include_router(module.router, prefix="/api/user")
+    return app
+
+
+async def loop_lag(stop, interval=0.005):
+    """Worst delay between when a sleep should wake up and when it does."""
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst * 1000.0
+
+
+async def run_load(app, n_requests, concurrency):
+    sem = asyncio.Semaphore(concurrency)
+    latencies = []
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(loop_lag(stop))
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as client:
+        async def one(i):
+            async with sem:
+                start = time.perf_counter()
+                kind = i % 3
+                if kind == 0:
+                    r = await client.get("/api/user/all-meals", params={"email": EMAIL})
+                elif kind == 1:
+                    r = await client.get("/api/user/weekly-summary", params={"email": EMAIL})
+                else:
+                    r = await client.post("/api/user/save-meal",
+                                          data={"name": "Biryani", "email": EMAIL,
+                                                "nutrients": json.dumps({"Calories_kcal": 450})},
+                                          files={"image": ("meal.jpg", io.BytesIO(IMAGE), "image/jpeg")})
+                r.raise_for_status()
+                latencies.append((time.perf_counter() - start) * 1000.0)
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(n_requests)))
+        elapsed = time.perf_counter() - start
+    stop.set()
+    return elapsed, sorted(latencies), await lag_task
+
+
+def cleanup():
+    db = db_module.get_db()
+    for meal in db.meals.find({"email": EMAIL, "image": {"$ne": None}}, {"image": 1, "image_key": 1}):
+        path = meal.get("image") or ""
+        local = str(original_path(meal["image_key"])) if meal.get("image_key") else path
+        if local and os.path.exists(local):
+            os.remove(local)
+    db.meals.delete_many({"email": EMAIL})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Throughput of meal routes with blocking vs async MongoDB access')
+    parser.add_argument('--requests', type=int, default=1500)
+    parser.add_argument('--concurrency', type=int, default=100)
+    args = parser.parse_args()
+
+    os.makedirs(os.path.join("app", "models", "meal_images"), exist_ok=True)
+    cleanup()
+    print(f"{'mode':<10} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'max loop stall ms':>18}")
+    try:
+        for mode in ("blocking", "motor"):
+            elapsed, latencies, lag_ms = asyncio.run(run_load(build_app(mode), args.requests, args.concurrency))
+            db_module.close_clients()
+            p50 = latencies[len(latencies) // 2]
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            print(f"{mode:<10} {len(latencies) / elapsed:>8.0f} {p50:>8.1f} {p99:>8.1f} {lag_ms:>18.1f}")
+    finally:
+        cleanup()
+        db_module.close_clients()
+
+
+if __name__ == '__main__':
+    main()
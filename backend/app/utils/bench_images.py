@@ -0,0 +1,125 @@
+"""Benchmark repeated image fetches with and without cache-friendly URLs.
+
+Serves the same images three ways in-process and replays a client that opens
+a screen showing them ``--views`` times, honouring Cache-Control and ETags:
+
+  static (before)   plain StaticFiles, as app.main mounted it: no
+                    Cache-Control, so every view revalidates each image
+  static ?v=        CachedStaticFiles with versioned URLs: cached for a year
+  /api/images       content-addressed thumbnails: cached for a year (the
+                    total includes rendering them on first view)
+
+Usage (from backend/):
+  python -m app.utils.bench_images --images 20 --views 50
+"""
+import argparse
+import asyncio
+import io
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+from fastapi import FastAPI
+from fastapi.staticfiles import StaticFiles
+from PIL import Image
+from starlette.datastructures import UploadFile
+
+from app.utils import image_store
+from app.utils.http_cache import CachedStaticFiles
+
+
+class CachingClient:
+    """Just enough of a private HTTP cache: max-age freshness and If-None-Match."""
+
+    def __init__(self, client):
+        self.client = client
+        self.entries = {}  # url -> (expires_at, etag, body)
+        self.requests = 0
+        self.bytes = 0
+
+    async def get(self, url):
+        now = time.monotonic()
+        entry = self.entries.get(url)
+        if entry and entry[0] > now:
+            return entry[2]
+        headers = {"If-None-Match": entry[1]} if entry and entry[1] else {}
+        r = await self.client.get(url, headers=headers)
+        self.requests += 1
+        self.bytes += len(r.content)
+        body = entry[2] if r.status_code == 304 else r.content
+        max_age = 0
+        for part in r.headers.get("cache-control", "").split(","):
+            if part.strip().startswith("max-age="):
+                max_age = int(part.strip()[len("max-age="):])
+        self.entries[url] = (now + max_age, r.headers.get("etag"), body)
+        return body
+
+
+def sample_images(n, size=(1200, 900)):
+    images = []
+    for i in range(n):
+        buf = io.BytesIO()
+        Image.frombytes("RGB", size, os.urandom(size[0] * size[1] * 3)).save(buf, "JPEG", quality=85)
+        images.append(buf.getvalue())
+    return images
+
+
+async def replay(app, urls, views):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        cache = CachingClient(client)
+        start = time.perf_counter()
+        for _ in range(views):
+            await asyncio.gather(*(cache.get(u) for u in urls))
+        elapsed = (time.perf_counter() - start) * 1000.0
+    return elapsed, cache.requests, cache.bytes
+
+
+async def run(args, workdir):
+    static_dir = os.path.join(workdir, "static")
+    os.makedirs(static_dir)
+    image_store.IMAGE_STORE_DIR = Path(workdir) / "store"
+    names, keys = [], []
+    for i, data in enumerate(sample_images(args.images)):
+        name = f"meal{i}.jpg"
+        with open(os.path.join(static_dir, name), "wb") as f:
+            f.write(data)
+        names.append(name)
+        keys.append(await image_store.store_upload(UploadFile(io.BytesIO(data), filename=name)))
+
+    from app.routes import images
+    cases = []
+    before = FastAPI()
+    before.mount("/static", StaticFiles(directory=static_dir))
+    cases.append(("static (before)", before, [f"/static/{n}" for n in names]))
+    versioned = FastAPI()
+    versioned.mount("/static", CachedStaticFiles(directory=static_dir))
+    cases.append(("static ?v=", versioned,
+                  [f"/static/{n}?v={os.stat(os.path.join(static_dir, n)).st_mtime_ns:x}" for n in names]))
+    store = FastAPI()
+    store.include_router(images.router, prefix="/api/images")
+    cases.append(("/api/images", store, [image_store.image_urls(k)["thumb"]["webp"] for k in keys]))
+
+    print(f"{'serving':<16} {'total ms':>9} {'requests':>9} {'KB sent':>9}")
+    for label, app, urls in cases:
+        elapsed, requests, sent = await replay(app, urls, args.views)
+        print(f"{label:<16} {elapsed:>9.1f} {requests:>9} {sent / 1024:>9.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark repeated image fetches against cache headers')
+    parser.add_argument('--images', type=int, default=20)
+    parser.add_argument('--views', type=int, default=50)
+    args = parser.parse_args()
+    workdir = tempfile.mkdtemp(prefix="bench_images_")
+    try:
+        asyncio.run(run(args, workdir))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Benchmark event-loop stalls during a login storm.
+
+Fires ``--logins`` concurrent password verifications while a probe task
+measures how late the event loop wakes up for a 10ms sleep, i.e. how long
+every other request would be stuck:
+
+  inline (before)   pwd_context.verify() called directly in the coroutine,
+                    as the /login and /token handlers did
+  worker pool       passwords.verify_password() on the bounded executor
+
+Usage (from backend/):
+  python -m app.utils.bench_passwords --logins 20 --rounds 12
+"""
+import argparse
+import asyncio
+import time
+
+from app.utils import passwords
+
+
+async def probe(lags, done):
+    while not done.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lags.append((time.perf_counter() - start - 0.01) * 1000.0)
+
+
+async def storm(label, verify, n):
+    lags, done = [], asyncio.Event()
+    probe_task = asyncio.create_task(probe(lags, done))
+    await asyncio.sleep(0.05)
+    start = time.perf_counter()
+    await asyncio.gather(*(verify() for _ in range(n)))
+    elapsed = (time.perf_counter() - start) * 1000.0
+    done.set()
+    await probe_task
+    lags.sort()
+    p99 = lags[min(len(lags) - 1, int(0.99 * len(lags)))] if lags else 0.0
+    print(f"{label:<16} {elapsed:>9.0f} {max(lags, default=0.0):>12.1f} {p99:>12.1f}")
+
+
+async def run(args):
+    hashed = passwords.pwd_context.hash("correct horse battery staple")
+
+    async def inline():
+        return passwords.pwd_context.verify("correct horse battery staple", hashed)
+
+    async def pooled():
+        return await passwords.verify_password("correct horse battery staple", hashed)
+
+    print(f"{args.logins} logins, {passwords.BCRYPT_ROUNDS} rounds, {passwords.PASSWORD_HASH_WORKERS} workers")
+    print(f"{'verify':<16} {'total ms':>9} {'max stall ms':>12} {'p99 stall ms':>12}")
+    await storm("inline (before)", inline, args.logins)
+    await storm("worker pool", pooled, args.logins)
+    s = passwords.stats()
+    print(f"pool queue p50/p99: {s['queue_ms_p50']}/{s['queue_ms_p99']} ms, run p50: {s['run_ms_p50']} ms")
+    passwords.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark event-loop stalls from bcrypt during concurrent logins')
+    parser.add_argument('--logins', type=int, default=20)
+    parser.add_argument('--rounds', type=int, default=None, help='override BCRYPT_ROUNDS for this run')
+    args = parser.parse_args()
+    if args.rounds:
+        passwords.BCRYPT_ROUNDS = args.rounds
+        passwords.pwd_context.update(bcrypt__rounds=args.rounds, bcrypt__min_rounds=args.rounds,
+                                     bcrypt__max_rounds=args.rounds)
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
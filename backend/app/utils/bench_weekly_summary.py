@@ -0,0 +1,135 @@
+"""Benchmark /weekly-summary for a user with a long meal history.
+
+Seeds a scratch database with one user's meals spread over several years
+(plus a week of water records), builds their daily_totals rollups, and times
+the original implementation (fetch every meal, bucket per day in Python, 7
+water lookups) against app.routes.weekly_summary. Both must agree.
+
+Usage (from backend/, needs a local mongod):
+  python -m app.utils.bench_weekly_summary --meals 50000 --runs 5
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+import pytz
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient
+
+from app.models.nutrients import normalize_nutrients
+from app.routes.weekly_summary import build_weekly_summary, week_days
+from app.utils.rollups import rebuild
+
+EMAIL = "bench@nutripk.local"
+
+
+def legacy_weekly_summary(db, email):
+    """The original endpoint (every meal fetched and bucketed in Python), kept for comparison."""
+    tz_pk = pytz.timezone('Asia/Karachi')
+    now_pk = datetime.now(tz_pk)
+    monday_pk = (now_pk - timedelta(days=now_pk.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+    week_days = [(monday_pk + timedelta(days=i)).astimezone(pytz.utc).replace(tzinfo=None) for i in range(7)]
+    meals = list(db.meals.find({"email": email}))
+    summary = []
+    for day_start in week_days:
+        day_end = day_start + timedelta(days=1)
+        day_meals = [m for m in meals
+                     if isinstance(m.get("timestamp"), datetime) and day_start <= m["timestamp"] < day_end]
+        totals = {"calories": 0, "protein": 0, "carbs": 0, "fats": 0}
+        for meal in day_meals:
+            nutrition = meal.get("nutrition") or normalize_nutrients(meal.get("nutrients"))
+            for k in totals:
+                totals[k] += nutrition.get(k, 0.0)
+        water_doc = db.water.find_one({"email": email, "date": day_start.strftime('%Y-%m-%d')})
+        summary.append({"count": len(day_meals), **totals,
+                        "waterGlasses": int((water_doc or {}).get('glasses') or 0)})
+    return summary
+
+
+def seed(db, n_meals, years, rng):
+    db.meals.delete_many({"email": EMAIL})
+    db.water.delete_many({"email": EMAIL})
+    db.daily_totals.delete_many({"email": EMAIL})
+    now = datetime.utcnow()
+    span = years * 365 * 86400
+    batch = []
+    for i in range(n_meals):
+        # the last 50 meals land in the current week, the rest anywhere in history
+        offset = rng.uniform(0, 6 * 86400) if i < 50 else rng.uniform(0, span)
+        nutrition = {"calories": rng.uniform(100, 900), "protein": rng.uniform(2, 60),
+                     "carbs": rng.uniform(5, 120), "fats": rng.uniform(1, 50)}
+        batch.append({
+            "email": EMAIL, "name": f"dish {i % 300}",
+            "timestamp": now - timedelta(seconds=offset),
+            "nutrients": {"Calories_kcal": nutrition["calories"], "Protein_g": nutrition["protein"],
+                          "Carbs_g": nutrition["carbs"], "Fats_g": nutrition["fats"]},
+            "nutrition": nutrition,
+        })
+        if len(batch) == 5000:
+            db.meals.insert_many(batch)
+            batch = []
+    if batch:
+        db.meals.insert_many(batch)
+    days_pk = week_days()
+    db.water.insert_many([{"email": EMAIL, "date": d.strftime('%Y-%m-%d'), "glasses": rng.randint(0, 10)}
+                          for d in days_pk])
+
+
+def best_of(fn, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - start) * 1000.0)
+    return min(times), sum(times) / len(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark weekly-summary against meal history size')
+    parser.add_argument('--mongo-url', type=str, default="mongodb://localhost:27017")
+    parser.add_argument('--db', type=str, default="nutripk_bench")
+    parser.add_argument('--meals', type=int, default=50000)
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--keep', action='store_true', help='Keep the seeded data afterwards')
+    args = parser.parse_args()
+
+    client = MongoClient(args.mongo_url)
+    db = client[args.db]
+    print(f"Seeding {args.meals} meals over {args.years} years into {args.db} ...")
+    seed(db, args.meals, args.years, random.Random(0))
+    start = time.perf_counter()
+    rebuild(db, EMAIL)
+    print(f"Rollups rebuilt in {(time.perf_counter() - start) * 1000.0:.0f}ms")
+
+    legacy_best, legacy_mean, legacy = best_of(lambda: legacy_weekly_summary(db, EMAIL), args.runs)
+    loop = asyncio.new_event_loop()
+    motor_client = AsyncIOMotorClient(args.mongo_url, io_loop=loop)
+    motor_db = motor_client[args.db]
+    new_best, new_mean, new = best_of(
+        lambda: loop.run_until_complete(build_weekly_summary(motor_db, EMAIL)), args.runs)
+    motor_client.close()
+    loop.close()
+
+    # legacy looked water up by the UTC date of PK midnight (a day early); compare meals only
+    mismatched = [i for i, (a, b) in enumerate(zip(legacy, new["summary"]))
+                  if a["count"] != b["count"] or abs(a["calories"] - b["totalCalories"]) > 1e-6]
+
+    print(f"{'implementation':<16} {'best ms':>9} {'mean ms':>9}")
+    print(f"{'legacy':<16} {legacy_best:>9.1f} {legacy_mean:>9.1f}")
+    print(f"{'daily_totals':<16} {new_best:>9.1f} {new_mean:>9.1f}")
+    print(f"speedup: {legacy_best / new_best:.1f}x, meals this week: {new['totals']['meals']}")
+    if mismatched:
+        print(f"MISMATCH: per-day meal totals differ on days {mismatched}")
+
+    if not args.keep:
+        db.meals.delete_many({"email": EMAIL})
+        db.water.delete_many({"email": EMAIL})
+        db.daily_totals.delete_many({"email": EMAIL})
+    client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,77 @@
+import os
+import threading
+
+from motor.motor_asyncio import AsyncIOMotorClient
 from pymongo import MongoClient
 from pymongo.database import Database
 
+# One client per process, shared by every request (each client owns a pool).
+MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
+MONGO_DB = os.getenv("MONGO_DB", "nutripk")
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "30000"))
+
+_client = None
+_motor_client = None
+_lock = threading.Lock()
+
+
+def client_options():
+    return {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS,
+    }
+
+
+def get_client() -> MongoClient:
+    """The process-wide pymongo client, created on first use."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = MongoClient(MONGO_URL, **client_options())
+    return _client
+
+
+def get_motor_client():
+    """The process-wide Motor client, created on first use."""
+    global _motor_client
+    if _motor_client is None:
+        with _lock:
+            if _motor_client is None:
+                _motor_client = AsyncIOMotorClient(MONGO_URL, **client_options())
+    return _motor_client
+
+
 def get_db() -> Database:
-    client = MongoClient("mongodb://localhost:27017")
-    db = client["nutripk"]
-    return db
+    return get_client()[MONGO_DB]
+
+
+def get_motor_db():
+    return get_motor_client()[MONGO_DB]
+
+
+def open_clients():
+    """Create the shared Motor client used by the API; called once at startup.
+
+    The pymongo client is only created on first use (CLI tools, index bootstrap).
+    """
+    get_motor_client()
+
+
+def close_clients():
+    """Close the shared clients; called at application shutdown."""
+    global _client, _motor_client
+    with _lock:
+        client, motor_client = _client, _motor_client
+        _client = _motor_client = None
+    if client is not None:
+        client.close()
+    if motor_client is not None:
+        motor_client.close()
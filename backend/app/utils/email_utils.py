@@ -1,14 +1,30 @@
+import logging
+import os
 import smtplib
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
-def send_reset_email(to_email, reset_link):
-    # Gmail SMTP setup
-    smtp_server = 'smtp.gmail.com'
-    smtp_port = 587
-    sender_email = 'duaamir4211@gmail.com'  # <-- Replace with your Gmail
-    sender_password = 'hawkjfwdztfsjwmm'   # <-- Replace with your Gmail App Password
+from dotenv import load_dotenv
 
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Gmail SMTP setup; point SMTP_HOST/SMTP_PORT at app.utils.smtp_sink to test locally
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") == "1"
+# Account and app password come from the environment or backend/.env, never from code
+SMTP_USER = os.getenv("SMTP_USER", "")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
+EMAIL_FROM = os.getenv("EMAIL_FROM", SMTP_USER)
+SMTP_TIMEOUT_SECONDS = float(os.getenv("SMTP_TIMEOUT_SECONDS", "20"))
+# Servers drop idle sessions after a few minutes; reconnect rather than reuse a stale one
+SMTP_IDLE_SECONDS = float(os.getenv("SMTP_IDLE_SECONDS", "60"))
+
+
+def reset_email(reset_link):
     subject = 'NutriPK Password Reset'
     body = f"""
     Hello,
@@ -20,32 +36,10 @@ def send_reset_email(to_email, reset_link):
 
     If you did not request this, please ignore this email.
     """
+    return subject, body
 
-    msg = MIMEMultipart()
-    msg['From'] = sender_email
-    msg['To'] = to_email
-    msg['Subject'] = subject
-    msg.attach(MIMEText(body, 'plain'))
-
-    try:
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        server.login(sender_email, sender_password)
-        server.sendmail(sender_email, to_email, msg.as_string())
-        server.quit()
-        return True
-    except Exception as e:
-        print(f"Failed to send email: {e}")
-        return False
-
-
-def send_otp_email(to_email, otp_code):
-    # Gmail SMTP setup (reuse same creds)
-    smtp_server = 'smtp.gmail.com'
-    smtp_port = 587
-    sender_email = 'duaamir4211@gmail.com'  # <-- Replace with your Gmail
-    sender_password = 'hawkjfwdztfsjwmm'   # <-- Replace with your Gmail App Password
 
+def otp_email(otp_code):
     subject = 'Your NutriPK One-Time Password (OTP)'
     body = f"""
     Hello,
@@ -56,20 +50,83 @@ def send_otp_email(to_email, otp_code):
 
     This code expires in 10 minutes. If you did not request this, please ignore this email.
     """
+    return subject, body
+
 
+def build_message(to_email, subject, body):
     msg = MIMEMultipart()
-    msg['From'] = sender_email
+    msg['From'] = EMAIL_FROM
     msg['To'] = to_email
     msg['Subject'] = subject
     msg.attach(MIMEText(body, 'plain'))
+    return msg
+
+
+class SMTPConnection:
+    """One SMTP session (connect, STARTTLS, login) reused across messages.
+
+    Not thread-safe: use it from a single thread. A session idle for longer
+    than SMTP_IDLE_SECONDS, or dropped by the server, is reopened on the next
+    send; a send that fails on a dropped connection is retried once.
+    """
+
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, user=SMTP_USER, password=SMTP_PASSWORD,
+                 starttls=SMTP_STARTTLS, timeout=SMTP_TIMEOUT_SECONDS, idle_seconds=SMTP_IDLE_SECONDS):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.idle_seconds = idle_seconds
+        self._server = None
+        self._last_used = 0.0
+        self.connects = 0
+        self.sent = 0
+
+    def _connect(self):
+        if not (self.user and self.password):
+            raise RuntimeError("SMTP_USER and SMTP_PASSWORD must be set to send email")
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                server.starttls()
+            server.login(self.user, self.password)
+        except Exception:
+            server.close()
+            raise
+        self._server = server
+        self._last_used = time.monotonic()
+        self.connects += 1
+        logger.info("Opened SMTP session to %s:%s", self.host, self.port)
+
+    def send(self, to_email, subject, body):
+        """Send one message; raises smtplib.SMTPException/OSError on failure."""
+        self.close_if_idle()
+        msg = build_message(to_email, subject, body).as_string()
+        for attempt in (1, 2):
+            if self._server is None:
+                self._connect()
+            try:
+                self._server.sendmail(EMAIL_FROM, [to_email], msg)
+                break
+            except smtplib.SMTPServerDisconnected:
+                self.close()
+                if attempt == 2:
+                    raise
+        self._last_used = time.monotonic()
+        self.sent += 1
+
+    def close_if_idle(self):
+        if self._server is not None and time.monotonic() - self._last_used > self.idle_seconds:
+            self.close()
+
+    def close(self):
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except Exception:
+            self._server.close()
+        self._server = None
 
-    try:
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        server.login(sender_email, sender_password)
-        server.sendmail(sender_email, to_email, msg.as_string())
-        server.quit()
-        return True
-    except Exception as e:
-        print(f"Failed to send OTP email: {e}")
-        return False
\ No newline at end of file
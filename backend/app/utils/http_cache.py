@@ -0,0 +1,49 @@
+"""HTTP caching helpers: conditional GET and cache headers for static images.
+
+Content-addressed image URLs (/api/images/...) never change meaning, so they
+are served with a one-year immutable Cache-Control. Legacy /static files get
+the same when requested with a ``?v=`` version (see versioned_static_url),
+otherwise a short max-age with ETag revalidation.
+"""
+import os
+from pathlib import Path
+from urllib.parse import parse_qs
+
+from fastapi import Request
+from fastapi.staticfiles import StaticFiles
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+STATIC_MAX_AGE = int(os.getenv("STATIC_MAX_AGE", "3600"))
+STATIC_DIR = Path(__file__).resolve().parent.parent / "models"
+
+
+def etag_matches(request: Request, etag):
+    """True if the request's If-None-Match covers ``etag`` (strong comparison)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return header.strip() == "*" or etag in (t.strip() for t in header.split(","))
+
+
+def versioned_static_url(url):
+    """Append ``?v=<mtime>`` to a /static URL so it can be cached as immutable;
+    the version changes whenever the file is replaced."""
+    if not url or not url.startswith("/static/") or "?" in url:
+        return url
+    try:
+        mtime = os.stat(STATIC_DIR / url[len("/static/"):]).st_mtime_ns
+    except OSError:
+        return url
+    return f"{url}?v={mtime:x}"
+
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles (ETag/304 and Range support) plus Cache-Control headers."""
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        response.headers["Cache-Control"] = (
+            IMMUTABLE_CACHE_CONTROL if query.get("v") else f"public, max-age={STATIC_MAX_AGE}"
+        )
+        return response
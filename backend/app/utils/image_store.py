@@ -0,0 +1,147 @@
+"""Content-addressed image store with lazily generated derivatives.
+
+Images are keyed by the sha256 of the uploaded bytes, so uploading the same
+photo twice stores it once. The original is kept as a bounded JPEG
+(IMAGE_MAX_SIDE) and smaller WebP/JPEG derivatives are generated on first
+request and then served from disk:
+
+  IMAGE_STORE_DIR/originals/ab/<key>.jpg
+  IMAGE_STORE_DIR/derived/v<DERIVATIVE_VERSION>/<size>/ab/<key>.<fmt>
+
+URLs are /api/images/<key>/original.jpg and /api/images/<key>/<size>.<fmt>;
+image_urls() builds them all for API responses. They are immutable and
+cached for a year by clients; bump DERIVATIVE_VERSION whenever derivative
+sizes or encoder settings change so clients fetch the new renditions.
+"""
+import logging
+import os
+import re
+import tempfile
+from pathlib import Path
+
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from PIL import Image, ImageOps
+
+from app.utils.uploads import IMAGE_MAX_SIDE, MODELS_DIR, UPLOAD_MAX_BYTES, downscale_image, stream_to_temp
+
+logger = logging.getLogger(__name__)
+
+IMAGE_STORE_DIR = Path(os.getenv("IMAGE_STORE_DIR", str(MODELS_DIR / "image_store")))
+IMAGE_URL_PREFIX = "/api/images"
+DERIVATIVE_VERSION = 1
+# Longest side in pixels of each derivative
+DERIVATIVE_SIZES = {"thumb": 160, "small": 480, "medium": 1024}
+# url extension -> (PIL format, media type, save options)
+DERIVATIVE_FORMATS = {
+    "webp": ("WEBP", "image/webp", {"quality": 80, "method": 4}),
+    "jpg": ("JPEG", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+_KEY = re.compile(r"^[0-9a-f]{64}$")
+
+
+def is_key(key):
+    return bool(key) and bool(_KEY.match(key))
+
+
+def original_path(key):
+    return IMAGE_STORE_DIR / "originals" / key[:2] / f"{key}.jpg"
+
+
+def derivative_path(key, size, fmt):
+    return IMAGE_STORE_DIR / "derived" / f"v{DERIVATIVE_VERSION}" / size / key[:2] / f"{key}.{fmt}"
+
+
+def image_urls(key):
+    """{"original": url, "<size>": {"webp": url, "jpg": url}, ...} for a stored image."""
+    if not is_key(key):
+        return None
+    urls = {"original": f"{IMAGE_URL_PREFIX}/{key}/original.jpg"}
+    for size in DERIVATIVE_SIZES:
+        urls[size] = {fmt: f"{IMAGE_URL_PREFIX}/{key}/{size}.{fmt}?v={DERIVATIVE_VERSION}"
+                      for fmt in DERIVATIVE_FORMATS}
+    return urls
+
+
+def _atomic_write(dest, write):
+    """Call write(tmp_path) and rename the result to ``dest``."""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=dest.parent, suffix=".part")
+    os.close(fd)
+    try:
+        write(tmp)
+        os.replace(tmp, dest)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _store_file(src, key):
+    dest = original_path(key)
+    if not dest.exists():  # already stored under the same content hash
+        _atomic_write(dest, lambda tmp: downscale_image(src, tmp, IMAGE_MAX_SIDE))
+    return key
+
+
+async def _store_temp(tmp_path, key):
+    try:
+        return await run_in_threadpool(_store_file, tmp_path, key)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+async def store_upload(upload: UploadFile, max_bytes=UPLOAD_MAX_BYTES):
+    """Stream an upload into the store and return its key (413/400 on bad input)."""
+    tmp_path, key = await stream_to_temp(upload, IMAGE_STORE_DIR / "tmp", max_bytes)
+    return await _store_temp(tmp_path, key)
+
+
+class _BytesUpload:
+    """Minimal async reader over in-memory bytes, for store_bytes()."""
+
+    def __init__(self, data):
+        self._data = memoryview(data)
+        self._pos = 0
+
+    async def read(self, size=-1):
+        end = len(self._data) if size < 0 else self._pos + size
+        chunk = bytes(self._data[self._pos:end])
+        self._pos += len(chunk)
+        return chunk
+
+
+async def store_bytes(data, max_bytes=UPLOAD_MAX_BYTES):
+    """Store already-decoded image bytes (e.g. a base64 data URI) and return the key."""
+    tmp_path, key = await stream_to_temp(_BytesUpload(data), IMAGE_STORE_DIR / "tmp", max_bytes)
+    return await _store_temp(tmp_path, key)
+
+
+def ensure_derivative(key, size, fmt):
+    """Path of a derivative, generating it from the original on first use.
+
+    Raises FileNotFoundError if the original is not in the store.
+    """
+    dest = derivative_path(key, size, fmt)
+    if dest.exists():
+        return dest
+    src = original_path(key)
+    if not src.exists():
+        raise FileNotFoundError(key)
+    pil_format, _, options = DERIVATIVE_FORMATS[fmt]
+    side = DERIVATIVE_SIZES[size]
+
+    def write(tmp):
+        with Image.open(src) as img:
+            img.draft("RGB", (side, side))
+            img = ImageOps.exif_transpose(img).convert("RGB")
+            img.thumbnail((side, side), Image.Resampling.LANCZOS)
+            img.save(tmp, pil_format, **options)
+
+    # concurrent first requests may both render; the last rename wins, same bytes
+    _atomic_write(dest, write)
+    logger.debug("Generated %s/%s.%s", key, size, fmt)
+    return dest
@@ -0,0 +1,130 @@
+"""Index bootstrap for the API's collections (meals, water, users, rollups, email outbox).
+
+ensure_indexes() creates the indexes the API's hot queries rely on and
+reports which ones it created. check_indexes() runs explain() on each hot
+query and flags any plan that still falls back to a collection scan.
+It runs at API startup (unless ENSURE_INDEXES_ON_STARTUP=0) and as a CLI.
+
+Usage (from backend/):
+  python -m app.utils.indexes            # create missing indexes
+  python -m app.utils.indexes --check    # also explain hot queries, exit 1 on COLLSCAN
+"""
+import argparse
+import logging
+import os
+import sys
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+from app.utils.db import close_clients, get_db
+from app.utils.outbox import EMAIL_OUTBOX_RETENTION_DAYS
+
+logger = logging.getLogger(__name__)
+
+ENSURE_INDEXES_ON_STARTUP = os.getenv("ENSURE_INDEXES_ON_STARTUP", "1") == "1"
+
+# (collection, keys, options)
+INDEXES = [
+    # _id breaks timestamp ties for keyset pagination (app.utils.pagination)
+    ("meals", [("email", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)],
+     {"name": "email_1_timestamp_-1__id_-1"}),
+    ("water", [("email", ASCENDING), ("date", ASCENDING)], {"name": "email_1_date_1", "unique": True}),
+    ("users", [("email", ASCENDING)], {"name": "email_1", "unique": True}),
+    ("daily_totals", [("email", ASCENDING), ("date", ASCENDING)], {"name": "email_1_date_1", "unique": True}),
+    # sender claims (app.utils.outbox); the TTL index removes finished messages
+    ("email_outbox", [("status", ASCENDING), ("next_attempt_at", ASCENDING)], {"name": "status_1_next_attempt_at_1"}),
+    ("email_outbox", [("finished_at", ASCENDING)],
+     {"name": "finished_at_1", "expireAfterSeconds": EMAIL_OUTBOX_RETENTION_DAYS * 24 * 3600}),
+]
+
+
+def hot_queries():
+    """(label, collection, filter, sort) for the queries the API runs per request."""
+    now = datetime.utcnow()
+    return [
+        ("meals by email, newest first", "meals", {"email": "x"}, [("timestamp", DESCENDING), ("_id", DESCENDING)]),
+        ("meals in a week window", "meals",
+         {"email": "x", "timestamp": {"$gte": now - timedelta(days=7), "$lt": now}}, None),
+        ("water for one day", "water", {"email": "x", "date": "2024-01-01"}, None),
+        ("water for a week", "water", {"email": "x", "date": {"$in": ["2024-01-01", "2024-01-02"]}}, None),
+        ("user by email", "users", {"email": "x"}, None),
+        ("rollups for a week", "daily_totals", {"email": "x", "date": {"$in": ["2024-01-01", "2024-01-02"]}}, None),
+        ("outbox messages due", "email_outbox",
+         {"status": {"$in": ["pending", "sending"]}, "next_attempt_at": {"$lte": now}}, [("next_attempt_at", ASCENDING)]),
+    ]
+
+
+def ensure_indexes(db):
+    """Create missing indexes; returns [(collection, index name, status)].
+
+    status is "created", "exists" or "failed: <reason>" (e.g. duplicate emails
+    blocking a unique index); failures are logged, not raised.
+    """
+    report = []
+    for collection, keys, options in INDEXES:
+        name = options["name"]
+        if name in db[collection].index_information():
+            report.append((collection, name, "exists"))
+            continue
+        try:
+            db[collection].create_index(keys, **options)
+            report.append((collection, name, "created"))
+            logger.info("Created index %s on %s", name, collection)
+        except OperationFailure as e:
+            report.append((collection, name, f"failed: {e}"))
+            logger.warning("Could not create index %s on %s: %s", name, collection, e)
+    return report
+
+
+def _plan_stages(plan):
+    """All stage names in an explain() plan tree, whatever its nesting."""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            stages.extend(_plan_stages(value))
+    return stages
+
+
+def check_indexes(db):
+    """Explain each hot query; returns [(label, collection, stages, ok)]."""
+    results = []
+    for label, collection, query, sort in hot_queries():
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = cursor.explain().get("queryPlanner", {}).get("winningPlan", {})
+        stages = _plan_stages(plan)
+        results.append((label, collection, stages, "COLLSCAN" not in stages))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Create MongoDB indexes used by the API')
+    parser.add_argument('--check', action='store_true', help='Explain hot queries and fail on COLLSCAN')
+    args = parser.parse_args()
+
+    db = get_db()
+    try:
+        for collection, name, status in ensure_indexes(db):
+            print(f"{collection:<12} {name:<28} {status}")
+        if args.check:
+            print()
+            failed = False
+            for label, collection, stages, ok in check_indexes(db):
+                print(f"{'OK  ' if ok else 'FAIL'} {label:<32} {' > '.join(stages)}")
+                failed = failed or not ok
+            if failed:
+                sys.exit(1)
+    finally:
+        close_clients()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""Load test: shared pooled MongoDB client vs one client per request.
+
+Fires concurrent GET /api/user/all-meals requests at the app in-process and
+reports throughput, p50/p99 latency and the server's connection count
+(serverStatus) at peak and after the run. The "per-request" mode restores
+the old behaviour of building a new client on every call.
+
+Usage (from backend/, needs a local mongod):
+  python -m app.utils.load_test_db --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import threading
+import time
+
+import httpx
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient
+
+from app.main import app
+from app.utils import db as db_module
+
+EMAIL = "loadtest@nutripk.local"
+
+
+def legacy_get_db():
+    """The old dependency: a fresh client (and connection pool) per request."""
+    return AsyncIOMotorClient(db_module.MONGO_URL)[db_module.MONGO_DB]
+
+
+class ConnectionSampler(threading.Thread):
+    """Polls serverStatus().connections.current and keeps the peak."""
+
+    def __init__(self, url, interval=0.05):
+        super().__init__(daemon=True)
+        self.client = MongoClient(url, maxPoolSize=1)
+        self.interval = interval
+        self.peak = 0
+        self._done = threading.Event()
+
+    def current(self):
+        return self.client.admin.command("serverStatus")["connections"]["current"]
+
+    def run(self):
+        while not self._done.is_set():
+            self.peak = max(self.peak, self.current())
+            time.sleep(self.interval)
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100.0 * (len(values) - 1))))]
+
+
+async def run_load(n_requests, concurrency):
+    latencies = []
+    sem = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        async def one():
+            async with sem:
+                start = time.perf_counter()
+                r = await client.get("/api/user/all-meals", params={"email": EMAIL})
+                r.raise_for_status()
+                latencies.append((time.perf_counter() - start) * 1000.0)
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(n_requests)))
+        elapsed = time.perf_counter() - start
+    return elapsed, latencies
+
+
+def run_mode(mode, args):
+    if mode == "per-request":
+        app.dependency_overrides[db_module.get_motor_db] = legacy_get_db
+    else:
+        app.dependency_overrides.pop(db_module.get_motor_db, None)
+        db_module.open_clients()
+    sampler = ConnectionSampler(db_module.MONGO_URL)
+    before = sampler.current()
+    sampler.start()
+    elapsed, latencies = asyncio.run(run_load(args.requests, args.concurrency))
+    sampler.stop()
+    after = sampler.current()
+    db_module.close_clients()
+    app.dependency_overrides.clear()
+    sampler.client.close()
+    return {
+        "mode": mode, "rps": len(latencies) / elapsed,
+        "p50": percentile(latencies, 50), "p99": percentile(latencies, 99),
+        "peak": sampler.peak - before, "after": after - before,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare shared vs per-request MongoDB clients under load')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--meals', type=int, default=20, help='Meals seeded for the test user')
+    args = parser.parse_args()
+
+    seed_client = MongoClient(db_module.MONGO_URL)
+    meals = seed_client[db_module.MONGO_DB].meals
+    meals.delete_many({"email": EMAIL})
+    meals.insert_many([{"email": EMAIL, "name": f"dish {i}", "nutrition": {"calories": 100.0}}
+                       for i in range(args.meals)])
+    try:
+        results = [run_mode(mode, args) for mode in ("per-request", "shared")]
+    finally:
+        meals.delete_many({"email": EMAIL})
+        seed_client.close()
+
+    print(f"{'mode':<12} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'peak conns':>11} {'leaked conns':>13}")
+    for r in results:
+        print(f"{r['mode']:<12} {r['rps']:>8.0f} {r['p50']:>8.1f} {r['p99']:>8.1f} "
+              f"{r['peak']:>11} {r['after']:>13}")
+
+
+if __name__ == '__main__':
+    main()
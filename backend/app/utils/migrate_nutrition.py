@@ -0,0 +1,73 @@
+"""One-off migration: add the canonical `nutrition` field to existing meals.
+
+For every meal without `nutrition` (or every meal with --all), derives
+{calories, protein, carbs, fats} from its free-form `nutrients` dict using the
+column mapping in app.models.nutrients, and converts string timestamps to UTC
+datetimes so range queries and aggregations can use them.
+
+Usage (from backend/):
+  python -m app.utils.migrate_nutrition --dry-run
+  python -m app.utils.migrate_nutrition --batch-size 1000
+"""
+import argparse
+from datetime import timezone
+
+from dateutil.parser import parse as parse_dt
+from pymongo import UpdateOne
+
+from app.models.nutrients import normalize_nutrients
+from app.utils.db import close_clients, get_db
+
+
+def migrate(db, batch_size=1000, dry_run=False, all_meals=False):
+    query = {} if all_meals else {"nutrition": {"$exists": False}}
+    projection = {"nutrients": 1, "timestamp": 1}
+    stats = {"scanned": 0, "updated": 0, "timestamps_fixed": 0, "bad_timestamps": 0}
+    ops = []
+    for meal in db.meals.find(query, projection, batch_size=batch_size):
+        stats["scanned"] += 1
+        update = {"nutrition": normalize_nutrients(meal.get("nutrients"))}
+        ts = meal.get("timestamp")
+        if isinstance(ts, str):
+            try:
+                parsed = parse_dt(ts)
+                if parsed.tzinfo is not None:
+                    parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+                update["timestamp"] = parsed
+                stats["timestamps_fixed"] += 1
+            except Exception:
+                stats["bad_timestamps"] += 1
+        ops.append(UpdateOne({"_id": meal["_id"]}, {"$set": update}))
+        if len(ops) >= batch_size:
+            stats["updated"] += _flush(db, ops, dry_run)
+            ops = []
+    if ops:
+        stats["updated"] += _flush(db, ops, dry_run)
+    return stats
+
+
+def _flush(db, ops, dry_run):
+    if dry_run:
+        return len(ops)
+    result = db.meals.bulk_write(ops, ordered=False)
+    return result.modified_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill canonical nutrition fields on meals')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--dry-run', action='store_true', help='Compute changes without writing them')
+    parser.add_argument('--all', action='store_true', help='Recompute meals that already have nutrition')
+    args = parser.parse_args()
+
+    try:
+        stats = migrate(get_db(), args.batch_size, args.dry_run, args.all)
+    finally:
+        close_clients()
+    prefix = "[dry-run] " if args.dry_run else ""
+    print(f"{prefix}scanned={stats['scanned']} updated={stats['updated']} "
+          f"timestamps_fixed={stats['timestamps_fixed']} bad_timestamps={stats['bad_timestamps']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+"""Persistent outbound email queue (the ``email_outbox`` collection).
+
+Handlers call enqueue() and return; OutboxSender delivers in the background
+over one reused SMTP session (email_utils.SMTPConnection) on a dedicated
+thread, so neither the SMTP handshake nor the send blocks the event loop.
+
+A message document moves through:
+
+  pending -> sending -> sent
+                     -> pending (retry after backoff) ... -> failed
+                     -> expired (its expires_at passed before delivery)
+
+Claims are atomic (find_one_and_update), so several API processes can run a
+sender each. next_attempt_at doubles as the claim lease: a message left in
+"sending" by a crashed process is picked up again once it passes. Finished
+messages are removed by a TTL index after EMAIL_OUTBOX_RETENTION_DAYS.
+
+Usage (from backend/):
+  python -m app.utils.outbox                  # message counts by status
+  python -m app.utils.outbox --retry-failed   # requeue failed messages
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import smtplib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from pymongo import ReturnDocument
+
+from app.utils.db import close_clients, get_db, get_motor_db
+from app.utils.email_utils import SMTPConnection
+
+logger = logging.getLogger(__name__)
+
+EMAIL_OUTBOX_SENDER = os.getenv("EMAIL_OUTBOX_SENDER", "1") == "1"
+EMAIL_POLL_SECONDS = float(os.getenv("EMAIL_POLL_SECONDS", "5"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "6"))
+EMAIL_RETRY_BASE_SECONDS = float(os.getenv("EMAIL_RETRY_BASE_SECONDS", "10"))
+EMAIL_RETRY_MAX_SECONDS = float(os.getenv("EMAIL_RETRY_MAX_SECONDS", "900"))
+EMAIL_SEND_LEASE_SECONDS = float(os.getenv("EMAIL_SEND_LEASE_SECONDS", "120"))
+EMAIL_OUTBOX_RETENTION_DAYS = int(os.getenv("EMAIL_OUTBOX_RETENTION_DAYS", "7"))
+
+COLLECTION = "email_outbox"
+
+
+def retry_delay(attempts):
+    """Seconds before the next try after ``attempts`` failures: exponential, capped, jittered."""
+    delay = min(EMAIL_RETRY_MAX_SECONDS, EMAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def is_permanent(error):
+    """Errors that will not succeed on retry, e.g. a rejected recipient."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return True
+    code = getattr(error, "smtp_code", None)
+    return isinstance(code, int) and 500 <= code < 600 and not isinstance(error, smtplib.SMTPAuthenticationError)
+
+
+async def enqueue(to_email, subject, body, kind="email", expires_in: timedelta = None):
+    """Queue a message and wake the local sender; returns the outbox id."""
+    now = datetime.utcnow()
+    doc = {
+        "to": to_email,
+        "subject": subject,
+        "body": body,
+        "kind": kind,
+        "status": "pending",
+        "attempts": 0,
+        "created_at": now,
+        "next_attempt_at": now,
+        "expires_at": now + expires_in if expires_in else None,
+    }
+    result = await get_motor_db()[COLLECTION].insert_one(doc)
+    sender.wake()
+    return result.inserted_id
+
+
+class OutboxSender:
+    """Background task delivering queued messages over one SMTP session."""
+
+    def __init__(self, connection_factory=SMTPConnection):
+        self._connection_factory = connection_factory
+        self._conn = None
+        self._executor = None
+        self._task = None
+        self._wakeup = None
+        self._stopping = False
+        self._delivering = False
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.expired = 0
+
+    def start(self):
+        if self._task is not None:
+            return
+        self._stopping = False
+        self._conn = self._connection_factory()
+        if not (getattr(self._conn, "user", True) and getattr(self._conn, "password", True)):
+            logger.warning("SMTP_USER/SMTP_PASSWORD not set: queued email will not be delivered")
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="smtp")
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info("Email outbox sender started")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        if not self._delivering:
+            # idle or waiting on Mongo: nothing to lose
+            self._task.cancel()
+        try:
+            await asyncio.wait_for(self._task, timeout=EMAIL_SEND_LEASE_SECONDS)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            pass
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._conn.close)
+        self._executor.shutdown(wait=False)
+        self._task = None
+
+    def wake(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _claim(self):
+        now = datetime.utcnow()
+        return await get_motor_db()[COLLECTION].find_one_and_update(
+            {"status": {"$in": ["pending", "sending"]}, "next_attempt_at": {"$lte": now}},
+            {"$set": {"status": "sending",
+                      "next_attempt_at": now + timedelta(seconds=EMAIL_SEND_LEASE_SECONDS)},
+             "$inc": {"attempts": 1}},
+            sort=[("next_attempt_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _finish(self, doc, status, **fields):
+        fields.update({"status": status, "finished_at": datetime.utcnow()})
+        await get_motor_db()[COLLECTION].update_one({"_id": doc["_id"]}, {"$set": fields})
+
+    async def deliver(self, doc):
+        if doc.get("expires_at") and doc["expires_at"] <= datetime.utcnow():
+            self.expired += 1
+            await self._finish(doc, "expired")
+            return
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self._executor, self._conn.send, doc["to"], doc["subject"], doc["body"])
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if is_permanent(e) or doc["attempts"] >= EMAIL_MAX_ATTEMPTS:
+                self.failed += 1
+                logger.warning("Giving up on %s email to %s after %d attempts: %s",
+                               doc.get("kind"), doc["to"], doc["attempts"], error)
+                await self._finish(doc, "failed", last_error=error)
+                return
+            self.retried += 1
+            delay = retry_delay(doc["attempts"])
+            logger.info("Email to %s failed (attempt %d), retrying in %.0fs: %s",
+                        doc["to"], doc["attempts"], delay, error)
+            await get_motor_db()[COLLECTION].update_one({"_id": doc["_id"]}, {"$set": {
+                "status": "pending",
+                "last_error": error,
+                "next_attempt_at": datetime.utcnow() + timedelta(seconds=delay),
+            }})
+            return
+        self.sent += 1
+        await self._finish(doc, "sent")
+
+    async def _run(self):
+        while not self._stopping:
+            # cleared before the claim so an enqueue during it is not missed
+            self._wakeup.clear()
+            try:
+                doc = await self._claim()
+            except Exception as e:
+                logger.warning("Email outbox unavailable: %s", e)
+                doc = None
+            if doc is not None:
+                self._delivering = True
+                try:
+                    await self.deliver(doc)
+                except Exception as e:
+                    # the lease expires and another pass retries it
+                    logger.warning("Email outbox update failed: %s", e)
+                finally:
+                    self._delivering = False
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=EMAIL_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                # quiet period: drop the SMTP session rather than let the server time it out
+                await asyncio.get_running_loop().run_in_executor(self._executor, self._conn.close_if_idle)
+
+    def stats(self):
+        return {
+            "running": self._task is not None,
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+            "expired": self.expired,
+            "smtp_connects": self._conn.connects if self._conn else 0,
+        }
+
+
+sender = OutboxSender()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect the email outbox')
+    parser.add_argument('--retry-failed', action='store_true', help='requeue failed messages')
+    args = parser.parse_args()
+    try:
+        outbox = get_db()[COLLECTION]
+        if args.retry_failed:
+            result = outbox.update_many(
+                {"status": "failed"},
+                {"$set": {"status": "pending", "attempts": 0, "next_attempt_at": datetime.utcnow()},
+                 "$unset": {"finished_at": ""}},
+            )
+            print(f"Requeued {result.modified_count} failed messages")
+        for row in outbox.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}, {"$sort": {"_id": 1}}]):
+            print(f"{row['_id']:<10} {row['count']:>8}")
+    finally:
+        close_clients()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""Keyset pagination, projection and ETags for the meal history endpoints.
+
+Pages are ordered newest first on (timestamp, _id); the cursor is an opaque
+token holding the last (timestamp, _id) of the previous page, so every page
+is an index range scan on {email, timestamp, _id} no matter how deep the
+client pages.
+
+Meals saved with legacy string timestamps (or none) are still paged: MongoDB
+sorts them after every datetime one (descending: dates, then strings, then
+null/missing), and the cursor records which of those groups it stopped in.
+`python -m app.utils.migrate_nutrition` converts string timestamps to dates.
+"""
+import base64
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+
+import pytz
+from bson import ObjectId
+from fastapi import HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+
+from app.utils.http_cache import etag_matches
+
+MEALS_PAGE_SIZE = int(os.getenv("MEALS_PAGE_SIZE", "50"))
+MEALS_PAGE_MAX = int(os.getenv("MEALS_PAGE_MAX", "200"))
+# Fields left out of list responses unless asked for with ?fields=
+MEAL_HEAVY_FIELDS = ("items",)
+
+_PK_TZ = pytz.timezone('Asia/Karachi')
+
+
+def encode_cursor(meal):
+    _id = meal["_id"]
+    ts = meal.get("timestamp")
+    token = {"id": str(_id), "oid": isinstance(_id, ObjectId)}
+    if isinstance(ts, datetime):
+        token.update(k="d", t=ts.isoformat())
+    elif isinstance(ts, str):
+        token.update(k="s", t=ts)
+    else:
+        token.update(k="n", t=None)
+    return base64.urlsafe_b64encode(json.dumps(token, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Returns (timestamp, _id) where timestamp is a datetime, a legacy string or None."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        token = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        _id = ObjectId(token["id"]) if token["oid"] else token["id"]
+        kind = token.get("k", "d")
+        if kind == "d":
+            return datetime.fromisoformat(token["t"]), _id
+        if kind == "s":
+            return str(token["t"]), _id
+        if kind == "n":
+            return None, _id
+    except Exception:
+        pass
+    raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _after_cursor(ts, _id):
+    """Everything after (ts, _id) in newest-first order, across timestamp types."""
+    if ts is None:
+        return [{"timestamp": None, "_id": {"$lt": _id}}]
+    after = [{"timestamp": {"$lt": ts}}, {"timestamp": ts, "_id": {"$lt": _id}}]
+    if isinstance(ts, datetime):
+        after.append({"timestamp": {"$type": "string"}})
+    # null and missing timestamps sort last
+    after.append({"timestamp": None})
+    return after
+
+
+def _pk_day_start(value, name):
+    try:
+        day = datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be YYYY-MM-DD")
+    return _PK_TZ.localize(day).astimezone(pytz.utc).replace(tzinfo=None)
+
+
+def meal_query(email, date_from=None, date_to=None, cursor=None):
+    """Filter for one page: user, optional inclusive Asia/Karachi date range, cursor."""
+    query = {"email": email}
+    ts_range = {}
+    if date_from:
+        ts_range["$gte"] = _pk_day_start(date_from, "date_from")
+    if date_to:
+        ts_range["$lt"] = _pk_day_start(date_to, "date_to") + timedelta(days=1)
+    if ts_range:
+        query["timestamp"] = ts_range
+    if cursor:
+        query["$or"] = _after_cursor(*decode_cursor(cursor))
+    return query
+
+
+def meal_projection(fields=None):
+    """Whitelist from a comma-separated ``fields`` (cursor keys always kept),
+    otherwise everything except MEAL_HEAVY_FIELDS."""
+    if fields:
+        projection = {f.strip(): 1 for f in fields.split(",") if f.strip()}
+        projection.update({"_id": 1, "timestamp": 1})
+        if "image" in projection:
+            projection["image_key"] = 1  # for the per-size image URLs
+        return projection
+    return {f: 0 for f in MEAL_HEAVY_FIELDS}
+
+
+async def fetch_meal_page(db, email, limit=None, cursor=None, date_from=None, date_to=None, fields=None):
+    """Returns (meals, next_cursor); next_cursor is None on the last page."""
+    limit = max(1, min(limit or MEALS_PAGE_SIZE, MEALS_PAGE_MAX))
+    query = meal_query(email, date_from, date_to, cursor)
+    # one extra document tells us whether there is another page
+    meals = await (db.meals.find(query, meal_projection(fields))
+                   .sort([("timestamp", -1), ("_id", -1)])
+                   .limit(limit + 1)
+                   .to_list(None))
+    next_cursor = None
+    if len(meals) > limit:
+        meals = meals[:limit]
+        next_cursor = encode_cursor(meals[-1])
+    return meals, next_cursor
+
+
+def etag_response(request: Request, content):
+    """JSON response with a strong ETag over the body; 304 if the client has it."""
+    body = json.dumps(jsonable_encoder(content), separators=(",", ":"), sort_keys=True).encode()
+    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type=JSONResponse.media_type, headers=headers)
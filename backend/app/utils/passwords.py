@@ -0,0 +1,131 @@
+"""bcrypt hashing on a bounded worker pool, off the event loop.
+
+Each bcrypt call costs ~100-300ms of CPU at the default work factor. Running
+it inline in an async handler stalls every other request, so hashing and
+verification go to a small ThreadPoolExecutor (bcrypt releases the GIL).
+At most PASSWORD_HASH_WORKERS calls run at once; when PASSWORD_HASH_MAX_PENDING
+calls are already queued or running, new ones are rejected with 503 rather
+than queueing without bound. Queue and run times are kept for stats().
+
+The work factor is BCRYPT_ROUNDS. Hashes made with a different factor are
+re-hashed on the next successful login (verify_and_upgrade).
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+logger = logging.getLogger(__name__)
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+# hashes with other rounds still verify, but needs_update() flags them
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS, bcrypt__min_rounds=BCRYPT_ROUNDS, bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+_executor = None
+_pending = 0
+_stats = {"calls": 0, "rejected": 0, "upgraded": 0, "max_pending": 0}
+_queue_ms = deque(maxlen=1000)
+_run_ms = deque(maxlen=1000)
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+    return _executor
+
+
+async def _run(fn, *args):
+    global _pending
+    if _pending >= PASSWORD_HASH_MAX_PENDING:
+        _stats["rejected"] += 1
+        raise HTTPException(status_code=503, detail="Server busy, please try again.")
+    _pending += 1
+    _stats["max_pending"] = max(_stats["max_pending"], _pending)
+    submitted = time.perf_counter()
+
+    def job():
+        started = time.perf_counter()
+        return started, fn(*args), time.perf_counter()
+
+    try:
+        started, result, finished = await asyncio.get_running_loop().run_in_executor(_get_executor(), job)
+    finally:
+        _pending -= 1
+    _stats["calls"] += 1
+    _queue_ms.append((started - submitted) * 1000.0)
+    _run_ms.append((finished - started) * 1000.0)
+    return result
+
+
+async def hash_password(password):
+    return await _run(pwd_context.hash, password)
+
+
+def _verify_and_update(password, hashed):
+    try:
+        return pwd_context.verify_and_update(password, hashed)
+    except (ValueError, TypeError):
+        # missing or malformed stored hash
+        return False, None
+
+
+async def verify_password(password, hashed):
+    """Returns (ok, new_hash); new_hash is set when the stored hash should be
+    replaced because it was made with a different work factor."""
+    if not hashed:
+        return False, None
+    return await _run(_verify_and_update, password, hashed)
+
+
+async def verify_and_upgrade(password, user, users):
+    """Check ``password`` against ``user["password"]`` and, on success, store a
+    re-hashed password in the ``users`` collection if the work factor changed."""
+    ok, new_hash = await verify_password(password, user.get("password"))
+    if ok and new_hash:
+        await users.update_one({"_id": user["_id"]}, {"$set": {"password": new_hash}})
+        _stats["upgraded"] += 1
+        logger.info("Re-hashed password for %s with %d rounds", user.get("email"), BCRYPT_ROUNDS)
+    return ok
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q / 100.0 * len(values)))], 2)
+
+
+def stats():
+    return {
+        "rounds": BCRYPT_ROUNDS,
+        "workers": PASSWORD_HASH_WORKERS,
+        "max_pending": PASSWORD_HASH_MAX_PENDING,
+        "pending": _pending,
+        "peak_pending": _stats["max_pending"],
+        "calls": _stats["calls"],
+        "rejected": _stats["rejected"],
+        "upgraded": _stats["upgraded"],
+        "queue_ms_p50": _percentile(_queue_ms, 50),
+        "queue_ms_p99": _percentile(_queue_ms, 99),
+        "run_ms_p50": _percentile(_run_ms, 50),
+        "run_ms_p99": _percentile(_run_ms, 99),
+    }
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,343 @@
+"""Per-day nutrition rollups in the `daily_totals` collection.
+
+One small document per (email, Asia/Karachi local date) holding the meal
+count, summed nutrition fields and the day's water glasses:
+
+  {email, date: "YYYY-MM-DD", count, calories, protein, carbs, fats,
+   water_glasses, updated_at}
+
+save_meal/delete_meal apply $inc deltas and the water upsert sets
+water_glasses, so summary views read at most 7 or 31 documents instead of
+raw meals. Users with meals from before rollups existed are backfilled from
+raw data the first time their rollups are read (ensure_backfilled).
+
+Each user has a marker in `rollup_backfills`. Until its state is "done",
+meal and water writes leave the rollups alone and only count themselves
+(begun/ended) on the marker inside write_guard(); the backfill recomputes
+from raw data and marks the user done only if no write started or finished
+meanwhile, otherwise it recomputes. Writes that start after that see
+"done" and apply their deltas, so no write is missed or counted twice. One
+request backfills at a time (a lease on the marker); readers that find a
+backfill running read totals from raw data instead.
+
+The meal write and its rollup update are separate operations; if the update
+fails the rollup drifts, which the repair command finds and fixes:
+
+  python -m app.utils.rollups --dry-run            # report drift only
+  python -m app.utils.rollups [--email someone@x]  # recompute and repair
+"""
+import argparse
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+
+import pytz
+from pymongo import DeleteMany, DeleteOne, ReplaceOne, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.models.nutrients import NUTRIENT_FIELDS, normalize_nutrients
+from app.utils.db import close_clients, get_db
+
+LOCAL_TZ = 'Asia/Karachi'
+ROLLUP_FIELDS = ("count",) + NUTRIENT_FIELDS + ("water_glasses",)
+DRIFT_TOLERANCE = 1e-6
+BACKFILL_COLLECTION = "rollup_backfills"
+BACKFILL_LEASE_SECONDS = 120
+BACKFILL_ATTEMPTS = 5
+BACKFILL_RETRY_SECONDS = 0.05
+# a write counted as begun this long ago without ending is from a crashed process
+WRITE_STALE_SECONDS = 60
+
+logger = logging.getLogger(__name__)
+
+_tz = pytz.timezone(LOCAL_TZ)
+# emails whose backfill is done (permanent), to skip the marker lookup
+_backfilled = set()
+
+
+def local_date(ts):
+    """Asia/Karachi date (YYYY-MM-DD) of a UTC naive timestamp."""
+    return pytz.utc.localize(ts).astimezone(_tz).strftime('%Y-%m-%d')
+
+
+def meal_delta(meal, sign=1):
+    """$inc document adding (sign=1) or removing (sign=-1) one meal."""
+    nutrition = meal.get("nutrition") or normalize_nutrients(meal.get("nutrients"))
+    delta = {"count": sign}
+    for field in NUTRIENT_FIELDS:
+        delta[field] = sign * float(nutrition.get(field, 0.0))
+    return delta
+
+
+async def apply_meal(db, meal, sign=1):
+    """Add a saved meal to (or remove a deleted one from) its day's rollup.
+
+    Call it only when write_guard() yielded True. Removal never creates a
+    rollup and never takes a total below zero, so a day that has drifted
+    cannot go negative before the repair command fixes it.
+    """
+    ts = meal.get("timestamp")
+    if not meal.get("email") or not isinstance(ts, datetime):
+        return
+    key = {"email": meal["email"], "date": local_date(ts)}
+    delta = meal_delta(meal, sign)
+    if sign > 0:
+        await db.daily_totals.update_one(
+            key, {"$inc": delta, "$set": {"updated_at": datetime.utcnow()}}, upsert=True,
+        )
+        return
+    clamped = {field: {"$max": [0, {"$add": [{"$ifNull": [f"${field}", 0]}, value]}]}
+               for field, value in delta.items()}
+    await db.daily_totals.update_one(
+        {**key, "count": {"$gte": 1}},
+        [{"$set": {**clamped, "updated_at": datetime.utcnow()}}],
+    )
+
+
+async def try_apply_meal(db, meal, sign=1):
+    """apply_meal, logging a failure instead of raising: the meal write itself
+    succeeded, and the repair command fixes the drifted day."""
+    try:
+        await apply_meal(db, meal, sign)
+    except Exception:
+        logger.exception("Rollup update failed for %s; run python -m app.utils.rollups to repair",
+                         meal.get("email"))
+
+
+@asynccontextmanager
+async def write_guard(db, email):
+    """Wrap a raw meal or water write for ``email``.
+
+    Yields True when the caller should apply the write to the rollups
+    afterwards (the user is backfilled), False when a backfill is still to
+    come and will count it from raw data.
+    """
+    if not email or email in _backfilled:
+        yield True
+        return
+    markers = db[BACKFILL_COLLECTION]
+    try:
+        await markers.update_one(
+            {"_id": email, "state": {"$ne": "done"}},
+            {"$inc": {"begun": 1}, "$set": {"last_begun_at": datetime.utcnow()},
+             "$setOnInsert": {"ended": 0}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        # no match because the marker says done (or a racing insert created it)
+        marker = await markers.find_one({"_id": email}, {"state": 1})
+        if marker is not None and marker.get("state") == "done":
+            _backfilled.add(email)
+            yield True
+            return
+        raise
+    try:
+        yield False
+    finally:
+        await markers.update_one({"_id": email}, {"$inc": {"ended": 1}})
+
+
+async def set_water(db, email, date, glasses):
+    await db.daily_totals.update_one(
+        {"email": email, "date": date},
+        {"$set": {"water_glasses": int(glasses), "updated_at": datetime.utcnow()}},
+        upsert=True,
+    )
+
+
+async def read_daily_totals(db, email, dates):
+    """{date: rollup document} for the given local dates."""
+    return {doc["date"]: doc async for doc in
+            db.daily_totals.find({"email": email, "date": {"$in": list(dates)}}, {"_id": 0})}
+
+
+def rollup_pipeline(match):
+    """Per (email, local date) totals recomputed from raw meals."""
+    group = {
+        "_id": {"email": "$email",
+                "date": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp", "timezone": LOCAL_TZ}}},
+        "count": {"$sum": 1},
+        # meals without the typed `nutrition` field are normalized in Python
+        "legacy": {"$push": {"$cond": [{"$eq": [{"$type": "$nutrition"}, "object"]}, "$$REMOVE", "$nutrients"]}},
+    }
+    for field in NUTRIENT_FIELDS:
+        group[field] = {"$sum": {"$ifNull": [f"$nutrition.{field}", 0]}}
+    return [
+        {"$match": {**match, "timestamp": {"$type": "date"}}},
+        {"$project": {"email": 1, "timestamp": 1, "nutrition": 1, "nutrients": 1}},
+        {"$group": group},
+    ]
+
+
+def expected_rollups(db, email=None):
+    """{(email, date): rollup fields} recomputed from meals and water."""
+    match = {"email": email} if email else {}
+    return _expected(db.meals.aggregate(rollup_pipeline(match), allowDiskUse=True),
+                     db.water.find(match, {"email": 1, "date": 1, "glasses": 1}))
+
+
+def _expected(meal_rows, water_docs):
+    expected = {}
+    for row in meal_rows:
+        doc = {field: row[field] for field in ("count",) + NUTRIENT_FIELDS}
+        for nutrients in row["legacy"]:
+            nutrition = normalize_nutrients(nutrients)
+            for field in NUTRIENT_FIELDS:
+                doc[field] += nutrition[field]
+        doc["water_glasses"] = 0
+        expected[(row["_id"]["email"], row["_id"]["date"])] = doc
+    for water in water_docs:
+        doc = expected.setdefault((water["email"], water["date"]),
+                                  {field: 0 for field in ROLLUP_FIELDS})
+        doc["water_glasses"] = int(water.get("glasses") or 0)
+    return expected
+
+
+async def _expected_for(db, email):
+    rows = await db.meals.aggregate(rollup_pipeline({"email": email})).to_list(None)
+    water = await db.water.find({"email": email}, {"email": 1, "date": 1, "glasses": 1}).to_list(None)
+    return _expected(rows, water)
+
+
+async def daily_totals_from_raw(db, email, dates):
+    """Like read_daily_totals, recomputed from raw meals and water."""
+    dates = set(dates)
+    return {d: {"email": e, "date": d, **doc}
+            for (e, d), doc in (await _expected_for(db, email)).items() if d in dates}
+
+
+async def _claim_backfill(markers, email):
+    """Take the backfill lease; returns the marker, or None if the user is done
+    or another request holds the lease."""
+    now = datetime.utcnow()
+    try:
+        return await markers.find_one_and_update(
+            {"_id": email, "state": {"$ne": "done"},
+             "$or": [{"lease_until": None}, {"lease_until": {"$lt": now}}]},
+            {"$set": {"lease_until": now + timedelta(seconds=BACKFILL_LEASE_SECONDS)},
+             "$setOnInsert": {"begun": 0, "ended": 0}},
+            upsert=True, return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        marker = await markers.find_one({"_id": email}, {"state": 1})
+        if marker is not None and marker.get("state") == "done":
+            _backfilled.add(email)
+        return None
+
+
+async def ensure_backfilled(db, email):
+    """Build ``email``'s rollups from raw meals and water unless already done.
+
+    Runs once per user, so users with meals from before rollups existed see
+    full totals without a manual rebuild. Returns True once the rollups are
+    complete, False while another request is backfilling them (or writes kept
+    racing this one); the caller should then read totals from raw data.
+    """
+    if not email or email in _backfilled:
+        return True
+    markers = db[BACKFILL_COLLECTION]
+    marker = await _claim_backfill(markers, email)
+    if marker is None:
+        return email in _backfilled
+    for _ in range(BACKFILL_ATTEMPTS):
+        begun, ended = marker.get("begun", 0), marker.get("ended", 0)
+        if begun != ended:
+            last = marker.get("last_begun_at")
+            if last is not None and datetime.utcnow() - last > timedelta(seconds=WRITE_STALE_SECONDS):
+                # the writer died between begin and end
+                await markers.update_one({"_id": email, "begun": begun, "ended": ended},
+                                         {"$set": {"ended": begun}})
+            else:
+                # a meal or water write is in progress; let it land first
+                await asyncio.sleep(BACKFILL_RETRY_SECONDS)
+            marker = await markers.find_one({"_id": email})
+            continue
+        expected = await _expected_for(db, email)
+        now = datetime.utcnow()
+        ops = [ReplaceOne({"email": e, "date": d}, {"email": e, "date": d, **doc, "updated_at": now}, upsert=True)
+               for (e, d), doc in expected.items()]
+        ops.append(DeleteMany({"email": email, "date": {"$nin": [d for _, d in expected]}}))
+        await db.daily_totals.bulk_write(ops, ordered=False)
+        # done only if no write began or ended since the counters were read
+        done = await markers.find_one_and_update(
+            {"_id": email, "begun": begun, "ended": ended},
+            {"$set": {"state": "done", "done_at": now}, "$unset": {"lease_until": ""}},
+        )
+        if done is not None:
+            _backfilled.add(email)
+            logger.info("Backfilled %d daily rollups for %s", len(expected), email)
+            return True
+        marker = await markers.find_one({"_id": email})
+    await markers.update_one({"_id": email}, {"$unset": {"lease_until": ""}})
+    logger.warning("Rollup backfill for %s raced with writes; retrying on a later read", email)
+    return False
+
+
+def _drifted(actual, expected):
+    return [f for f in ROLLUP_FIELDS
+            if abs(float(actual.get(f, 0) or 0) - float(expected.get(f, 0))) > DRIFT_TOLERANCE]
+
+
+def rebuild(db, email=None, dry_run=False):
+    """Compare daily_totals with raw data and (unless dry_run) repair it.
+
+    Returns (report, drift) where drift lists (email, date, kind, fields).
+    """
+    expected = expected_rollups(db, email)
+    match = {"email": email} if email else {}
+    actual = {(d["email"], d["date"]): d for d in db.daily_totals.find(match)}
+
+    drift, ops = [], []
+    now = datetime.utcnow()
+    for key, doc in expected.items():
+        current = actual.get(key)
+        if current is None:
+            drift.append((*key, "missing", list(ROLLUP_FIELDS)))
+        else:
+            fields = _drifted(current, doc)
+            if not fields:
+                continue
+            drift.append((*key, "drift", fields))
+        ops.append(ReplaceOne({"email": key[0], "date": key[1]},
+                              {"email": key[0], "date": key[1], **doc, "updated_at": now}, upsert=True))
+    for key, current in actual.items():
+        if key not in expected:
+            drift.append((*key, "orphan", []))
+            ops.append(DeleteOne({"_id": current["_id"]}))
+
+    if ops and not dry_run:
+        for i in range(0, len(ops), 1000):
+            db.daily_totals.bulk_write(ops[i:i + 1000], ordered=False)
+    if not dry_run:
+        # rebuilt users need no lazy backfill (see ensure_backfilled)
+        for user_email in {e for e, _ in expected}:
+            db[BACKFILL_COLLECTION].update_one({"_id": user_email},
+                                               {"$set": {"state": "done", "done_at": now}}, upsert=True)
+    report = {"days": len(expected), "rollups": len(actual), "drifted": len(drift),
+              "repaired": 0 if dry_run else len(ops)}
+    return report, drift
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild daily_totals rollups from raw meals and water')
+    parser.add_argument('--email', type=str, default=None, help='Only this user')
+    parser.add_argument('--dry-run', action='store_true', help='Report drift without repairing it')
+    parser.add_argument('--show', type=int, default=20, help='Drifted days to list')
+    args = parser.parse_args()
+
+    try:
+        report, drift = rebuild(get_db(), args.email, args.dry_run)
+    finally:
+        close_clients()
+    for email, date, kind, fields in drift[:args.show]:
+        print(f"{kind:<8} {email:<32} {date}  {', '.join(fields)}")
+    if len(drift) > args.show:
+        print(f"... {len(drift) - args.show} more")
+    prefix = "[dry-run] " if args.dry_run else ""
+    print(f"{prefix}days={report['days']} rollups={report['rollups']} "
+          f"drifted={report['drifted']} repaired={report['repaired']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""Local SMTP stand-in for testing the email outbox without a real server.
+
+Accepts any login, prints one line per message and counts connections, so
+you can see the sender reuse one session. ``--fail-every N`` answers every
+Nth message with a temporary 451 to exercise retries. No STARTTLS: run the
+API with SMTP_STARTTLS=0.
+
+Usage (from backend/):
+  python -m app.utils.smtp_sink --port 1025 --fail-every 3
+  SMTP_HOST=127.0.0.1 SMTP_PORT=1025 SMTP_STARTTLS=0 SMTP_USER=dev SMTP_PASSWORD=dev uvicorn app.main:app
+"""
+import argparse
+import asyncio
+import email
+import time
+
+
+class SMTPSink:
+    def __init__(self, fail_every=0, delay=0.0):
+        self.fail_every = fail_every
+        self.delay = delay
+        self.connections = 0
+        self.messages = 0
+        self.accepted = 0
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        conn_id = self.connections
+        peer = writer.get_extra_info("peername")
+        print(f"[sink] connection #{conn_id} from {peer}")
+
+        async def reply(line):
+            writer.write(f"{line}\r\n".encode())
+            await writer.drain()
+
+        async def readline():
+            return (await reader.readline()).decode("utf-8", "replace").rstrip("\r\n")
+
+        await reply("220 nutripk-smtp-sink ready")
+        rcpts = []
+        try:
+            while True:
+                line = await readline()
+                if not line and reader.at_eof():
+                    break
+                verb = line.split(" ", 1)[0].upper()
+                if verb in ("EHLO", "HELO"):
+                    await reply("250-nutripk-smtp-sink")
+                    await reply("250 AUTH PLAIN LOGIN")
+                elif verb == "AUTH":
+                    parts = line.split()
+                    if len(parts) > 1 and parts[1].upper() == "LOGIN":
+                        # base64 "Username:" unless sent with the command, then "Password:"
+                        if len(parts) == 2:
+                            await reply("334 VXNlcm5hbWU6")
+                            await readline()
+                        await reply("334 UGFzc3dvcmQ6")
+                        await readline()
+                    elif len(parts) == 2:
+                        await reply("334 ")
+                        await readline()
+                    await reply("235 Authentication succeeded")
+                elif verb == "MAIL":
+                    rcpts = []
+                    await reply("250 OK")
+                elif verb == "RCPT":
+                    rcpts.append(line.split(":", 1)[-1].strip().strip("<>"))
+                    await reply("250 OK")
+                elif verb == "DATA":
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    data = []
+                    while True:
+                        chunk = await readline()
+                        if chunk == ".":
+                            break
+                        data.append(chunk[1:] if chunk.startswith("..") else chunk)
+                    self.messages += 1
+                    if self.delay:
+                        await asyncio.sleep(self.delay)
+                    if self.fail_every and self.messages % self.fail_every == 0:
+                        print(f"[sink] #{conn_id} message {self.messages} -> 451 (simulated failure)")
+                        await reply("451 Temporary failure, try again")
+                        continue
+                    self.accepted += 1
+                    msg = email.message_from_string("\n".join(data))
+                    print(f"[sink] #{conn_id} {time.strftime('%H:%M:%S')} to={','.join(rcpts)} "
+                          f"subject={msg['Subject']!r} (accepted {self.accepted}, connections {self.connections})")
+                    await reply("250 OK: queued")
+                elif verb == "RSET":
+                    rcpts = []
+                    await reply("250 OK")
+                elif verb == "NOOP":
+                    await reply("250 OK")
+                elif verb == "QUIT":
+                    await reply("221 Bye")
+                    break
+                else:
+                    await reply("502 Command not implemented")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            print(f"[sink] connection #{conn_id} closed")
+
+
+async def serve(args):
+    sink = SMTPSink(fail_every=args.fail_every, delay=args.delay_ms / 1000.0)
+    server = await asyncio.start_server(sink.handle, args.host, args.port)
+    print(f"[sink] listening on {args.host}:{args.port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local SMTP server that prints and counts received messages')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=1025)
+    parser.add_argument('--fail-every', type=int, default=0, help='answer every Nth message with 451')
+    parser.add_argument('--delay-ms', type=float, default=0.0, help='per-message processing delay')
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Unit checks for the meal history keyset cursors.
+
+Runs without MongoDB: pages are read from an in-memory list sorted and
+filtered the way MongoDB compares mixed timestamp types (descending: dates,
+then strings, then null/missing).
+
+Usage (from backend/):
+  python -m app.utils.test_pagination
+"""
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.utils.pagination import _after_cursor, decode_cursor, encode_cursor, meal_query
+
+# BSON sort order of the timestamp types meals have been stored with ($lt only
+# matches values of the same type)
+_TYPE_RANK = {type(None): 0, str: 1, ObjectId: 2, datetime: 3}
+
+
+def _rank(value):
+    return _TYPE_RANK[type(value)]
+
+
+def _matches(doc, query):
+    for field, cond in query.items():
+        if field == "$or":
+            if not any(_matches(doc, clause) for clause in cond):
+                return False
+            continue
+        value = doc.get(field)
+        if isinstance(cond, dict):
+            if "$type" in cond and not isinstance(value, str):
+                return False
+            if "$lt" in cond and not (_rank(value) == _rank(cond["$lt"]) and value < cond["$lt"]):
+                return False
+        elif value != cond:
+            return False
+    return True
+
+
+def _newest_first(docs):
+    return sorted(docs, key=lambda d: (_rank(d.get("timestamp")), d.get("timestamp") or 0, d["_id"]),
+                  reverse=True)
+
+
+def test_cursor_round_trip():
+    oid = ObjectId()
+    ts = datetime(2025, 3, 1, 12, 30, 5, 123000)
+    for meal, expected in [
+        ({"_id": oid, "timestamp": ts}, (ts, oid)),
+        ({"_id": oid, "timestamp": "2024-01-05T10:00:00"}, ("2024-01-05T10:00:00", oid)),
+        ({"_id": oid}, (None, oid)),
+        ({"_id": oid, "timestamp": None}, (None, oid)),
+        ({"_id": "legacy-id", "timestamp": ts}, (ts, "legacy-id")),
+    ]:
+        assert decode_cursor(encode_cursor(meal)) == expected, meal
+    for bad in ["", "not-a-cursor", encode_cursor({"_id": oid, "timestamp": ts})[:-4]]:
+        try:
+            decode_cursor(bad)
+        except HTTPException as e:
+            assert e.status_code == 400
+        else:
+            raise AssertionError(f"accepted {bad!r}")
+
+
+def test_after_cursor_clauses():
+    oid = ObjectId()
+    ts = datetime(2025, 3, 1)
+    assert _after_cursor(ts, oid) == [
+        {"timestamp": {"$lt": ts}},
+        {"timestamp": ts, "_id": {"$lt": oid}},
+        {"timestamp": {"$type": "string"}},
+        {"timestamp": None},
+    ]
+    assert _after_cursor("2024-01-05", oid) == [
+        {"timestamp": {"$lt": "2024-01-05"}},
+        {"timestamp": "2024-01-05", "_id": {"$lt": oid}},
+        {"timestamp": None},
+    ]
+    assert _after_cursor(None, oid) == [{"timestamp": None, "_id": {"$lt": oid}}]
+
+
+def test_pages_cover_mixed_timestamps_once():
+    base = datetime(2025, 1, 1)
+    docs = []
+    for i in range(12):
+        docs.append({"_id": ObjectId(), "email": "a@b.c", "timestamp": base + timedelta(hours=i // 2)})
+    for i in range(5):
+        docs.append({"_id": ObjectId(), "email": "a@b.c", "timestamp": f"2024-12-0{1 + i // 2}T08:00:00"})
+    for i in range(4):
+        docs.append({"_id": ObjectId(), "email": "a@b.c", "timestamp": None})
+        docs.append({"_id": ObjectId(), "email": "a@b.c"})
+    ordered = _newest_first(docs)
+
+    for page_size in (1, 3, 4, 7):
+        seen, cursor = [], None
+        while True:
+            page = [d for d in ordered if _matches(d, meal_query("a@b.c", cursor=cursor))][:page_size]
+            seen.extend(d["_id"] for d in page)
+            if len(page) < page_size:
+                break
+            cursor = encode_cursor(page[-1])
+        assert seen == [d["_id"] for d in ordered], page_size
+
+
+if __name__ == '__main__':
+    test_cursor_round_trip()
+    test_after_cursor_clauses()
+    test_pages_cover_mixed_timestamps_once()
+    print("OK")
@@ -0,0 +1,127 @@
+"""Streaming, size-capped image uploads.
+
+Uploads are copied to a temporary file next to their destination in
+UPLOAD_CHUNK_BYTES chunks (file I/O runs in the threadpool, never on the
+event loop) and rejected with 413 once they pass UPLOAD_MAX_BYTES. Callers
+(app.utils.image_store) downscale/re-encode the temp file and only then
+rename it into place with os.replace, so a half-written image is never
+visible under its final name.
+
+Starlette receives and spools the whole multipart body before a handler
+runs, so UploadSizeLimitMiddleware rejects bodies over UPLOAD_MAX_BODY_BYTES
+first: from Content-Length before anything is read, or, for a body sent
+without one, as soon as the bytes received pass the limit. stream_to_temp
+also checks the size Starlette recorded for the file before copying it.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+MODELS_DIR = Path(__file__).resolve().parent.parent / "models"
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+# Whole multipart request: the image (base64 profile images are 4/3 larger) plus form fields
+UPLOAD_MAX_BODY_BYTES = int(os.getenv("UPLOAD_MAX_BODY_BYTES", str(UPLOAD_MAX_BYTES * 4 // 3 + 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(256 * 1024)))
+# Longest side of stored images; 0 re-encodes at full size
+IMAGE_MAX_SIDE = int(os.getenv("IMAGE_MAX_SIDE", "1600"))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+
+
+def downscale_image(src, dest, max_side=IMAGE_MAX_SIDE, quality=IMAGE_JPEG_QUALITY):
+    """Re-encode ``src`` as a JPEG at ``dest`` with its longest side <= max_side
+    (0 re-encodes at full size).
+
+    EXIF orientation is applied before resizing so photos stay upright.
+    Raises ValueError if ``src`` is not a readable image.
+    """
+    try:
+        with Image.open(src) as img:
+            if max_side:
+                img.draft("RGB", (max_side, max_side))
+            img = ImageOps.exif_transpose(img)
+            if img.mode != "RGB":
+                img = img.convert("RGB")
+            if max_side:
+                img.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+            img.save(dest, "JPEG", quality=quality, optimize=True)
+    except (OSError, Image.DecompressionBombError) as e:
+        logger.info("Rejected upload %s: %s", src, e)
+        raise ValueError("Invalid image")
+
+
+async def stream_to_temp(upload: UploadFile, dest_dir, max_bytes=UPLOAD_MAX_BYTES):
+    """Copy ``upload`` in chunks to a temp file in ``dest_dir``.
+
+    Returns (temp path, sha256 hex digest of the content). Raises
+    HTTPException 413, with the temp file removed, past ``max_bytes``.
+    """
+    size_hint = getattr(upload, "size", None)
+    if size_hint is not None and size_hint > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Image too large (limit {max_bytes} bytes)")
+    dest_dir = Path(dest_dir)
+    await run_in_threadpool(dest_dir.mkdir, parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=dest_dir, suffix=".part")
+    digest = hashlib.sha256()
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            size = 0
+            while True:
+                chunk = await upload.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(status_code=413,
+                                        detail=f"Image too large (limit {max_bytes} bytes)")
+                digest.update(chunk)
+                await run_in_threadpool(tmp.write, chunk)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return tmp_path, digest.hexdigest()
+
+
+class UploadSizeLimitMiddleware:
+    """Answer 413 to multipart requests larger than ``max_body_bytes``
+    (0 disables) before the body is parsed."""
+
+    def __init__(self, app, max_body_bytes=UPLOAD_MAX_BODY_BYTES):
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.max_body_bytes <= 0:
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        if not headers.get("content-type", "").startswith("multipart/"):
+            await self.app(scope, receive, send)
+            return
+        detail = f"Request too large (limit {self.max_body_bytes} bytes)"
+        length = headers.get("content-length", "")
+        if length.isdigit() and int(length) > self.max_body_bytes:
+            await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
+            return
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_bytes:
+                    # raised inside form parsing, before any response is sent
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,102 @@
+"""Short-lived in-process cache of user documents.
+
+Authenticated profile reads would otherwise cost a Mongo round-trip each.
+Entries expire after USER_CACHE_TTL_SECONDS and the cache holds at most
+USER_CACHE_MAX_ENTRIES users (least recently used dropped first). Handlers
+that change a user document must call invalidate(email). Invalidation is per
+process, so with several workers another process may serve a profile up to
+the TTL old.
+
+Documents are cached without secrets (see USER_CACHE_PROJECTION); anything
+that needs the password hash or OTP must read Mongo directly.
+"""
+import copy
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from app.utils.db import get_motor_db
+
+logger = logging.getLogger(__name__)
+
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+USER_CACHE_PROJECTION = {"password": 0, "otp_code": 0, "otp_expires": 0}
+
+
+class UserCache:
+    """LRU + TTL cache of user documents keyed by email.
+
+    ``get`` returns a deep copy, so callers may mutate the result.
+    """
+
+    def __init__(self, max_entries=USER_CACHE_MAX_ENTRIES, ttl_seconds=USER_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._entries = OrderedDict()  # email -> (expires_at, doc)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, email):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(email)
+                    self.hits += 1
+                    return copy.deepcopy(entry[1])
+                del self._entries[email]
+            self.misses += 1
+        return None
+
+    def set(self, email, doc):
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries.pop(email, None)
+            self._entries[email] = (time.monotonic() + self.ttl, copy.deepcopy(doc))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, email):
+        with self._lock:
+            if self._entries.pop(email, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+            }
+
+
+user_cache = UserCache()
+
+
+async def get_cached_user(email):
+    """User document without secrets, from the cache or Mongo; None if unknown."""
+    user = user_cache.get(email)
+    if user is not None:
+        return user
+    user = await get_motor_db().users.find_one({"email": email}, USER_CACHE_PROJECTION)
+    if user is not None:
+        user_cache.set(email, user)
+    return user
+
+
+def invalidate(email):
+    user_cache.invalidate(email)
@@ -1,4 +1,4 @@
-import React, { useEffect, useState } from "react";
+import React, { useEffect, useRef, useState } from "react";
 import { useFocusEffect } from "expo-router";
 import { View, Text, StyleSheet, TouchableOpacity, Image, ScrollView, Alert } from "react-native";
 import AsyncStorage from '@react-native-async-storage/async-storage';
@@ -7,6 +7,9 @@ import { useRouter } from "expo-router";
 import { parseToDateObj, formatTimePK, formatDatePK } from './_utils/dateUtils';
 import { BACKEND_BASE } from './config';
 
+// meals per request; the next page is fetched when the list is scrolled near the end
+const MEALS_PAGE_SIZE = 30;
+
 function getDayLabel(dateStr) {
   const today = new Date();
   const yesterday = new Date();
@@ -23,6 +26,10 @@ export default function SavedMeals() {
   const [brokenImages, setBrokenImages] = useState({});
   const router = useRouter();
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const loadedMeals = useRef([]);
+  const loadingMoreRef = useRef(false);
 
   // Delete meal handler (improved)
   const handleDeleteMeal = async (meal) => {
@@ -59,8 +66,14 @@ export default function SavedMeals() {
     );
   };
 
-  const fetchMeals = async () => {
-    setLoading(true);
+  const fetchMeals = async (cursor = null) => {
+    if (cursor) {
+      if (loadingMoreRef.current) return;
+      loadingMoreRef.current = true;
+      setLoadingMore(true);
+    } else {
+      setLoading(true);
+    }
     try {
       // Replace with backend API call
       // You may need to pass user email if required by backend
@@ -68,12 +81,20 @@ export default function SavedMeals() {
       if (!email) {
         setGroupedMeals({});
         setLoading(false);
+        loadingMoreRef.current = false;
+        setLoadingMore(false);
         return;
       }
-  const res = await fetch(`${BACKEND_BASE}/api/user/all-meals?email=${encodeURIComponent(email)}`);
+      // meal history is paged newest first: one page now, the next on scroll.
+      // nutrients is included because MealDetails shows it.
+      const qs = `email=${encodeURIComponent(email)}&fields=name,image,timestamp,nutrients&limit=${MEALS_PAGE_SIZE}`
+        + (cursor ? `&cursor=${encodeURIComponent(cursor)}` : '');
+      const res = await fetch(`${BACKEND_BASE}/api/user/all-meals?${qs}`);
       if (!res.ok) throw new Error('Failed to fetch meals');
       const data = await res.json();
-      const meals = data.meals || [];
+      const meals = cursor ? [...loadedMeals.current, ...(data.meals || [])] : (data.meals || []);
+      loadedMeals.current = meals;
+      setNextCursor(data.next_cursor || null);
   console.log('Fetched meals count:', meals.length);
   console.log('Sample meal.image values:', meals.slice(0,10).map(m => m.image));
       // group by date (dd/mm/yyyy) and sort
@@ -115,10 +136,23 @@ export default function SavedMeals() {
       });
       setGroupedMeals(groups);
     } catch (e) {
-      setGroupedMeals({});
+      if (!cursor) setGroupedMeals({});
       console.log('Error fetching meals:', e);
     }
-    setLoading(false);
+    if (cursor) {
+      loadingMoreRef.current = false;
+      setLoadingMore(false);
+    } else {
+      setLoading(false);
+    }
+  };
+
+  // Load the next page when the list is scrolled close to its end
+  const handleScroll = ({ nativeEvent }) => {
+    const { layoutMeasurement, contentOffset, contentSize } = nativeEvent;
+    if (nextCursor && layoutMeasurement.height + contentOffset.y >= contentSize.height - 400) {
+      fetchMeals(nextCursor);
+    }
   };
 
   // Helper to get user email (from AsyncStorage or context)
@@ -145,7 +179,7 @@ export default function SavedMeals() {
 
   return (
     <View style={styles.container}>
-      <ScrollView>
+      <ScrollView onScroll={handleScroll} scrollEventThrottle={200}>
         <Text style={styles.title}>Saved Meals</Text>
         {loading ? (
           <Text style={styles.empty}>Loading...</Text>
@@ -190,6 +224,7 @@ export default function SavedMeals() {
             </View>
           ))
         )}
+        {loadingMore && <Text style={styles.empty}>Loading more...</Text>}
       </ScrollView>
     </View>
   );